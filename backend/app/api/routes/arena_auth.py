@@ -23,7 +23,8 @@ from app.models import (
     User,
     UserRole,
 )
-from app.services.gemini import gemini_service
+from app.services.gemini import get_gemini_service
+from app.services.redis_client import redis_service
 from app.services.upload import UploadServiceFactory
 from app.api.deps import CurrentUser
 
@@ -83,7 +84,7 @@ async def verify_profile(
 
     # Verify profile with Gemini Vision
     try:
-        verified_data = await gemini_service.verify_profile_screenshot(content)
+        verified_data = await get_gemini_service().verify_profile_screenshot(content)
     except ValueError as e:
         logger.error(f"Gemini API error: {e}")
         raise InternalServerException(
@@ -368,6 +369,14 @@ async def get_user_profile(
     }
 
 
+async def _invalidate_cached_profile(user_id: str) -> None:
+    """Drop the realtime profile cache so messages pick up new name/avatar."""
+    try:
+        await redis_service.invalidate_user_profile(user_id)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate cached profile for {user_id}: {e}")
+
+
 class AvatarUpdate(BaseModel):
     """Request model for avatar update."""
     avatar_url: str
@@ -383,6 +392,7 @@ async def update_avatar(
     """
     current_user.avatar_url = avatar_data.avatar_url
     await current_user.save()
+    await _invalidate_cached_profile(current_user.id)
     
     logger.info(f"User {current_user.username} updated avatar")
     
@@ -507,6 +517,8 @@ async def update_profile(
     
     if updated_fields:
         await current_user.save()
+        if "username" in updated_fields:
+            await _invalidate_cached_profile(current_user.id)
         logger.info(f"User {current_user.id} updated profile: {', '.join(updated_fields)}")
     
     return {
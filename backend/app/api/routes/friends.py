@@ -4,22 +4,22 @@ import logging
 from datetime import datetime
 from typing import Any
 
-from beanie.operators import Or, And
+from beanie.operators import And, Or
 from fastapi import APIRouter, HTTPException
 
 from app.api.deps import CurrentUser
 from app.models import (
-    Friendship,
-    FriendshipStatus,
     FriendPublic,
     FriendRequestResponse,
+    Friendship,
     FriendshipPublic,
+    FriendshipStatus,
     FriendshipStatusResponse,
     FriendsListPublic,
-    User,
-    utc_now,
     Notification,
     NotificationType,
+    User,
+    utc_now,
 )
 from app.services.redis_client import redis_service
 
@@ -28,6 +28,14 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/friends", tags=["friends"])
 
 
+async def _invalidate_friend_graph(*user_ids: str) -> None:
+    """Drop cached friend sets and exclusions used by suggestions."""
+    try:
+        await redis_service.invalidate_friend_graph(*user_ids)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate friend graph cache: {e}")
+
+
 @router.post("/request/{user_id}")
 async def send_friend_request(
     user_id: str,
@@ -64,6 +72,7 @@ async def send_friend_request(
                 existing.status = FriendshipStatus.ACCEPTED
                 existing.updated_at = utc_now()
                 await existing.save()
+                await _invalidate_friend_graph(current_user.id, user_id)
                 return {
                     "success": True,
                     "message": "Đã chấp nhận lời mời kết bạn",
@@ -76,6 +85,7 @@ async def send_friend_request(
             existing.status = FriendshipStatus.PENDING
             existing.updated_at = utc_now()
             await existing.save()
+            await _invalidate_friend_graph(current_user.id, user_id)
             return {
                 "success": True,
                 "message": "Đã gửi lại lời mời kết bạn",
@@ -89,6 +99,7 @@ async def send_friend_request(
         status=FriendshipStatus.PENDING,
     )
     await friendship.insert()
+    await _invalidate_friend_graph(current_user.id, user_id)
 
     # Create notification for the addressee
     notification = Notification(
@@ -133,6 +144,7 @@ async def respond_to_friend_request(
     friendship.status = FriendshipStatus.ACCEPTED if response.accept else FriendshipStatus.REJECTED
     friendship.updated_at = utc_now()
     await friendship.save()
+    await _invalidate_friend_graph(friendship.requester_id, friendship.addressee_id)
 
     action = "chấp nhận" if response.accept else "từ chối"
     logger.info(f"Friend request {action}: {friendship_id}")
@@ -273,6 +285,7 @@ async def remove_friend(
         raise HTTPException(status_code=404, detail="Không tìm thấy mối quan hệ bạn bè")
 
     await friendship.delete()
+    await _invalidate_friend_graph(current_user.id, user_id)
 
     logger.info(f"Friendship removed: {current_user.id} <-> {user_id}")
 
@@ -349,25 +362,26 @@ async def get_online_friends(
         else:
             friend_ids.append(f.requester_id)
 
-    # Get all friends with their online status
+    # Get all friends and their online status in one query + one Redis pipeline
+    users = await User.find({"_id": {"$in": friend_ids}}).to_list() if friend_ids else []
+    user_ids = [u.id for u in users]
+    try:
+        online_flags = await redis_service.are_users_online(user_ids)
+    except Exception as e:
+        logger.warning(f"Failed to get online status for friends: {e}")
+        online_flags = [False] * len(user_ids)
+
     all_friends = []
-    for friend_id in friend_ids:
-        try:
-            user = await User.find_one(User.id == friend_id)
-            if user:
-                is_online = await redis_service.is_user_online(friend_id)
-                all_friends.append({
-                    "id": user.id,
-                    "username": user.username,
-                    "avatar_url": user.avatar_url,
-                    "rank": user.rank.value if user.rank else None,
-                    "level": user.level,
-                    "is_online": is_online,
-                    "last_active_at": user.last_active_at.isoformat() if user.last_active_at else None,
-                })
-        except Exception as e:
-            logger.warning(f"Failed to get friend data for {friend_id}: {e}")
-            continue
+    for user, is_online in zip(users, online_flags, strict=True):
+        all_friends.append({
+            "id": user.id,
+            "username": user.username,
+            "avatar_url": user.avatar_url,
+            "rank": user.rank.value if user.rank else None,
+            "level": user.level,
+            "is_online": is_online,
+            "last_active_at": user.last_active_at.isoformat() if user.last_active_at else None,
+        })
 
     # Sort: online users first, then by last_active_at (most recent first)
     def sort_key(friend):
@@ -160,12 +160,7 @@ async def get_conversation(
     # Get participants
     participants = await message_service.get_participants(conversation_id)
     
-    # Get participant's unread count
-    participant = await ConversationParticipant.find_one(
-        ConversationParticipant.conversation_id == conversation_id,
-        ConversationParticipant.user_id == current_user.id,
-    )
-    unread_count = participant.unread_count if participant else 0
+    unread_count = conversation.unread.get(current_user.id, 0)
     
     # Get last message if exists
     last_message = None
@@ -310,6 +305,7 @@ async def mark_conversation_seen(
         {
             "conversation_id": conversation_id,
             "user_id": current_user.id,
+            "username": current_user.username,
             "message_id": message_id,
         }
     )
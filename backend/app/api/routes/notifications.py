@@ -54,6 +54,7 @@ async def enrich_notification(notification: Notification) -> NotificationPublic:
         report_id=notification.report_id,
         content=notification.content,
         is_read=notification.is_read,
+        event_count=notification.event_count,
         created_at=notification.created_at,
     )
 
@@ -35,7 +35,7 @@ from app.models import (
 import json
 from app.core.config import settings
 from app.services.message_service import message_service
-from app.services.livekit_service import livekit_service
+from app.services.livekit_service import get_livekit_service
 
 logger = logging.getLogger(__name__)
 
@@ -101,11 +101,12 @@ async def ensure_team_conversation(team: Team) -> str:
     
     if team.conversation_id:
         # Ensure conversation has team_id set (for legacy conversations)
-        conv_doc = await Conversation.get(team.conversation_id)
-        if conv_doc and not conv_doc.team_id:
-            conv_doc.team_id = team.id
-            await conv_doc.save()
-            logger.info(f"Updated conversation {conv_doc.id} with team_id {team.id}")
+        result = await Conversation.find_one(
+            Conversation.id == team.conversation_id,
+            Conversation.team_id == None,
+        ).update({"$set": {"team_id": team.id}})
+        if result.modified_count:
+            logger.info(f"Updated conversation {team.conversation_id} with team_id {team.id}")
         return team.conversation_id
     
     # Create new conversation
@@ -119,10 +120,9 @@ async def ensure_team_conversation(team: Team) -> str:
     )
     
     # Mark as team chat
-    conv_doc = await Conversation.get(conversation.id)
-    if conv_doc:
-        conv_doc.team_id = team.id
-        await conv_doc.save()
+    await Conversation.find_one(Conversation.id == conversation.id).update(
+        {"$set": {"team_id": team.id}}
+    )
     
     # Add all current members to conversation
     members = await TeamMember.find(TeamMember.team_id == team.id).to_list()
@@ -239,10 +239,9 @@ async def create_team(
     
     # Mark conversation as team chat (so it won't show in regular chat list)
     from app.models import Conversation
-    conv_doc = await Conversation.get(conversation.id)
-    if conv_doc:
-        conv_doc.team_id = team.id
-        await conv_doc.save()
+    await Conversation.find_one(Conversation.id == conversation.id).update(
+        {"$set": {"team_id": team.id}}
+    )
     
     # Update team with conversation_id
     team.conversation_id = conversation.id
@@ -790,7 +789,7 @@ async def get_livekit_token(
         "rank": current_user.rank.value if current_user.rank else None
     })
     
-    token = livekit_service.generate_token(
+    token = await get_livekit_service().generate_token(
         room_name=room_name,
         identity=current_user.id,
         name=current_user.username,
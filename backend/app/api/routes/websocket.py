@@ -6,12 +6,13 @@ and delivers notifications in realtime.
 """
 
 import asyncio
-import json
 import logging
+import random
 import uuid
 from typing import Optional
 
 import jwt
+import orjson
 from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
@@ -58,12 +59,11 @@ class ConnectionManager:
         except Exception as e:
             logger.error(f"Failed to register socket in Redis: {e}")
         
-        # Update user's last_active_at
+        # Update user's last_active_at (single update, no load)
         try:
-            user = await User.find_one(User.id == user_id)
-            if user:
-                user.last_active_at = utc_now()
-                await user.save()
+            await User.find_one(User.id == user_id).update(
+                {"$set": {"last_active_at": utc_now()}}
+            )
         except Exception as e:
             logger.warning(f"Failed to update last_active_at on connect: {e}")
         
@@ -90,12 +90,11 @@ class ConnectionManager:
         except Exception as e:
             logger.error(f"Failed to remove socket from Redis: {e}")
         
-        # Update user's last_active_at on disconnect
+        # Update user's last_active_at on disconnect (single update, no load)
         try:
-            user = await User.find_one(User.id == user_id)
-            if user:
-                user.last_active_at = utc_now()
-                await user.save()
+            await User.find_one(User.id == user_id).update(
+                {"$set": {"last_active_at": utc_now()}}
+            )
         except Exception as e:
             logger.warning(f"Failed to update last_active_at on disconnect: {e}")
         
@@ -112,11 +111,22 @@ class ConnectionManager:
             return  # Silently skip - socket is closed
         
         try:
-            await websocket.send_json(data)
+            await websocket.send_text(orjson.dumps(data).decode())
         except Exception as e:
             # Only log if it's not a known closed socket
             if socket_id and socket_id not in self.closed_sockets:
                 logger.debug(f"Failed to send message via WebSocket: {e}")
+    
+    async def send_raw(self, websocket: WebSocket, text: str, socket_id: str = None):
+        """Send an already JSON-encoded message to a specific WebSocket."""
+        if socket_id and socket_id in self.closed_sockets:
+            return
+        
+        try:
+            await websocket.send_text(text)
+        except Exception as e:
+            if socket_id and socket_id not in self.closed_sockets:
+                logger.debug(f"Failed to send message via WebSocket: {e}")
 
 
 # Global connection manager
@@ -143,7 +153,12 @@ async def verify_websocket_token(token: str) -> Optional[User]:
     return user
 
 
-async def handle_client_message(user_id: str, websocket: WebSocket, message: dict):
+async def handle_client_message(
+    user_id: str,
+    username: str,
+    websocket: WebSocket,
+    message: dict,
+):
     """Handle incoming message from client."""
     msg_type = message.get("type")
     
@@ -222,6 +237,7 @@ async def handle_client_message(user_id: str, websocket: WebSocket, message: dic
                 {
                     "conversation_id": conversation_id,
                     "user_id": user_id,
+                    "username": username,
                 }
             )
     
@@ -243,6 +259,7 @@ async def handle_client_message(user_id: str, websocket: WebSocket, message: dic
                 {
                     "conversation_id": conversation_id,
                     "user_id": user_id,
+                    "username": username,
                     "message_id": message_id,
                 }
             )
@@ -275,7 +292,7 @@ async def websocket_endpoint(
     socket_id = await manager.connect(websocket, user_id)
     
     # Create Redis subscriptions for this user
-    notification_pubsub = None
+    notification_subscribed = False
     message_pubsub = None
     
     try:
@@ -284,18 +301,12 @@ async def websocket_endpoint(
             if manager.is_socket_active(socket_id):
                 await manager.send_message(websocket, data, socket_id)
         
-        # Callback for messages
-        async def message_callback(data: dict):
-            if manager.is_socket_active(socket_id):
-                await manager.send_message(websocket, data, socket_id)
-        
-        # Subscribe to notification channel
-        notification_pubsub = await redis_service.subscribe_user_notifications(
-            user_id, notification_callback
-        )
+        # Subscribe to notification channel (shared pattern subscription)
+        await redis_service.subscribe_user_notifications(user_id, notification_callback)
+        notification_subscribed = True
         
         # Subscribe to message channel
-        message_pubsub = redis_service.client.pubsub()
+        message_pubsub = redis_service.pubsub()
         message_channel = f"message:user:{user_id}"
         await message_pubsub.subscribe(message_channel)
         
@@ -321,11 +332,9 @@ async def websocket_endpoint(
                         # Reset retry count on successful message
                         retry_count = 0
                         if msg["type"] == "message":
-                            try:
-                                data = json.loads(msg["data"])
-                                await message_callback(data)
-                            except json.JSONDecodeError:
-                                pass
+                            # Payloads are published as JSON by our own
+                            # consumers; forward them without re-encoding
+                            await manager.send_raw(websocket, msg["data"].decode(), socket_id)
                 except asyncio.CancelledError:
                     logger.debug(f"Message listener cancelled for user {user_id}")
                     return
@@ -335,10 +344,11 @@ async def websocket_endpoint(
                         return
                     
                     retry_count += 1
-                    delay = min(base_delay * (2 ** retry_count), 30)  # Max 30 seconds
+                    # First retry waits ~base_delay; jitter keeps listeners from reconnecting in lock-step
+                    delay = min(base_delay * (2 ** (retry_count - 1)), 30) + random.uniform(0, 1)
                     logger.warning(
                         f"Message listener error for user {user_id} (attempt {retry_count}): {e}. "
-                        f"Retrying in {delay}s..."
+                        f"Retrying in {delay:.1f}s..."
                     )
                     
                     if retry_count >= max_retries:
@@ -356,7 +366,7 @@ async def websocket_endpoint(
                             pass
                         
                         # Create new connection
-                        message_pubsub = redis_service.client.pubsub()
+                        message_pubsub = redis_service.pubsub()
                         await message_pubsub.subscribe(message_channel)
                         logger.info(f"Resubscribed to message channel for user {user_id}")
                     except Exception as resub_error:
@@ -377,9 +387,9 @@ async def websocket_endpoint(
                 data = await websocket.receive_text()
                 
                 try:
-                    message = json.loads(data)
-                    await handle_client_message(user_id, websocket, message)
-                except json.JSONDecodeError:
+                    message = orjson.loads(data)
+                    await handle_client_message(user_id, user.username, websocket, message)
+                except orjson.JSONDecodeError:
                     pass
                     
             except WebSocketDisconnect:
@@ -389,9 +399,11 @@ async def websocket_endpoint(
         logger.error(f"WebSocket error for user {user_id}: {e}")
     finally:
         # Cleanup
-        if notification_pubsub:
+        if notification_subscribed:
             try:
-                await redis_service.unsubscribe(notification_pubsub)
+                await redis_service.unsubscribe_user_notifications(
+                    user_id, notification_callback
+                )
             except Exception as e:
                 logger.error(f"Error unsubscribing notifications: {e}")
         
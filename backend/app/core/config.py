@@ -53,6 +53,10 @@ class Settings(BaseSettings):
     # MongoDB Configuration
     MONGODB_URL: str = "mongodb://localhost:27017"
     MONGODB_DB_NAME: str = "arenahub"
+    MONGODB_MAX_POOL_SIZE: int = 50
+    MONGODB_MIN_POOL_SIZE: int = 10
+    MONGODB_MAX_IDLE_TIME_MS: int = 300000
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: int = 5000  # Fail fast instead of queueing forever
 
     SMTP_TLS: bool = True
     SMTP_SSL: bool = False
@@ -103,6 +107,11 @@ class Settings(BaseSettings):
     
     # Redis Configuration
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_MAX_CONNECTIONS: int = 100  # Command traffic (presence, caches, publish)
+    REDIS_POOL_TIMEOUT: float = 5.0  # Seconds a command waits for a free connection
+    # Each WebSocket holds one pub/sub connection for its lifetime, so this is
+    # also the per-process WebSocket cap: sockets beyond it fail to subscribe
+    REDIS_PUBSUB_MAX_CONNECTIONS: int = 1000
     
     # LiveKit Configuration
     LIVEKIT_URL: str = "wss://liqi-wo9viehf.livekit.cloud"
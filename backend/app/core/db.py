@@ -32,13 +32,21 @@ async def connect_to_mongodb() -> None:
     mongodb_url = settings.MONGODB_URL.lower()
     use_tls = "ssl=true" in mongodb_url or "tls=true" in mongodb_url
     
+    pool_options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+    }
+    
     if use_tls:
         mongodb_client = AsyncIOMotorClient(
             settings.MONGODB_URL,
-            tlsCAFile=certifi.where()
+            tlsCAFile=certifi.where(),
+            **pool_options,
         )
     else:
-        mongodb_client = AsyncIOMotorClient(settings.MONGODB_URL)
+        mongodb_client = AsyncIOMotorClient(settings.MONGODB_URL, **pool_options)
 
     # Initialize Beanie with document models
     await init_beanie(
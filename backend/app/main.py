@@ -26,6 +26,24 @@ async def lifespan(app: FastAPI):
     # Startup
     await connect_to_mongodb()
     
+    # Denormalize conversation members for data created before participant_ids
+    try:
+        from app.services.message_service import message_service
+        count = await message_service.backfill_conversation_members()
+        if count:
+            print(f"✅ Backfilled members for {count} conversations")
+    except Exception as e:
+        print(f"⚠️ Conversation member backfill failed: {e}")
+    
+    # Denormalize numeric rank for users created before rank_value
+    try:
+        from app.services.recommendation_service import backfill_rank_values
+        count = await backfill_rank_values()
+        if count:
+            print(f"✅ Backfilled rank_value for {count} users")
+    except Exception as e:
+        print(f"⚠️ Rank value backfill failed: {e}")
+    
     # Connect to Redis
     try:
         from app.services.redis_client import redis_service
@@ -34,6 +52,14 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ Redis connection failed: {e}")
     
+    # Declare RabbitMQ exchanges so the first publish skips channel setup
+    try:
+        from app.services.rabbitmq import declare_exchanges
+        await declare_exchanges()
+        print("✅ RabbitMQ exchanges declared")
+    except Exception as e:
+        print(f"⚠️ RabbitMQ exchange setup failed: {e}")
+    
     # Start notification consumer
     try:
         from app.services.notification_consumer import notification_consumer
@@ -77,6 +103,38 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ Error stopping notification consumer: {e}")
     
+    # Close shared RabbitMQ connection (after consumers, which use it)
+    try:
+        from app.services.rabbitmq import close_rabbitmq_connection
+        await close_rabbitmq_connection()
+        print("❌ RabbitMQ connection closed")
+    except Exception as e:
+        print(f"⚠️ Error closing RabbitMQ connection: {e}")
+    
+    # Close shared ImgBB HTTP client
+    try:
+        from app.services.upload import close_imgbb_client
+        await close_imgbb_client()
+        print("❌ ImgBB client closed")
+    except Exception as e:
+        print(f"⚠️ Error closing ImgBB client: {e}")
+    
+    # Close shared S3 upload clients
+    try:
+        from app.services.upload import close_s3_clients
+        await close_s3_clients()
+        print("❌ S3 upload clients closed")
+    except Exception as e:
+        print(f"⚠️ Error closing S3 upload clients: {e}")
+    
+    # Close shared ClawCloud S3 clients
+    try:
+        from app.services.clawcloud_s3 import clawcloud_s3
+        await clawcloud_s3.close()
+        print("❌ ClawCloud S3 clients closed")
+    except Exception as e:
+        print(f"⚠️ Error closing ClawCloud S3 clients: {e}")
+    
     # Disconnect Redis
     try:
         from app.services.redis_client import redis_service
@@ -15,6 +15,7 @@ This package contains all database models and schemas organized by domain:
 # Base types and enums
 from .base import (
     RankEnum,
+    RANK_VALUES,
     GameRoleEnum,
     UserRole,
     Message,
@@ -59,6 +60,9 @@ from .user import (
     UserUpdateMe,
     UpdatePassword,
     User,
+    UserProfileProjection,
+    UserSummaryProjection,
+    UserSuggestionProjection,
     UserPublic,
     UsersPublic,
 )
@@ -207,6 +211,7 @@ from .conversation import (
     MessagePublic,
     ConversationPublic,
     ConversationListItem,
+    ConversationMembers,
     MessagesResponse,
     ConversationsResponse,
 )
@@ -233,6 +238,7 @@ from .team import (
 __all__ = [
     # Base
     "RankEnum",
+    "RANK_VALUES",
     "GameRoleEnum", 
     "RoleEnum",
     "UserRole",
@@ -250,6 +256,9 @@ __all__ = [
     "UserUpdateMe",
     "UpdatePassword",
     "User",
+    "UserProfileProjection",
+    "UserSummaryProjection",
+    "UserSuggestionProjection",
     "UserPublic",
     "UsersPublic",
     # Item
@@ -364,6 +373,7 @@ __all__ = [
     "MessagePublic",
     "ConversationPublic",
     "ConversationListItem",
+    "ConversationMembers",
     "MessagesResponse",
     "ConversationsResponse",
     # Team/LFG
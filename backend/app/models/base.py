@@ -43,6 +43,19 @@ class RankEnum(str, Enum):
     CONQUEROR = "CONQUEROR"
 
 
+# Numeric rank for comparisons (0 = no rank)
+RANK_VALUES = {
+    RankEnum.BRONZE: 1,
+    RankEnum.SILVER: 2,
+    RankEnum.GOLD: 3,
+    RankEnum.PLATINUM: 4,
+    RankEnum.DIAMOND: 5,
+    RankEnum.VETERAN: 6,
+    RankEnum.MASTER: 7,
+    RankEnum.CONQUEROR: 8,
+}
+
+
 class GameRoleEnum(str, Enum):
     """Game position/role enum (renamed from RoleEnum to avoid confusion with UserRole)."""
     TOP = "TOP"
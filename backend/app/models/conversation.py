@@ -68,6 +68,9 @@ class Conversation(Document):
     last_message_id: Optional[str] = None  # For quick preview
     last_message_content: Optional[str] = None  # Preview text
     last_message_at: Optional[datetime] = None
+    # Denormalized from ConversationParticipant so hot reads skip the join
+    participant_ids: list[str] = Field(default_factory=list)  # Active member user IDs
+    unread: dict[str, int] = Field(default_factory=dict)  # Unread count by user ID
 
     class Settings:
         name = "conversations"
@@ -75,6 +78,8 @@ class Conversation(Document):
             "created_at",
             "updated_at",
             "team_id",
+            [("participant_ids", 1), ("updated_at", -1)],  # Conversation list per user
+            [("updated_at", -1), ("_id", -1)],  # Keyset pagination of conversation list
         ]
 
 
@@ -86,7 +91,7 @@ class ConversationParticipant(Document):
     user_id: str
     role: ParticipantRole = ParticipantRole.MEMBER
     last_seen_message_id: Optional[str] = None
-    unread_count: int = 0
+    unread_count: int = 0  # Legacy; unread counts now live on Conversation.unread
     muted: bool = False
     joined_at: datetime = Field(default_factory=utc_now)
     left_at: Optional[datetime] = None  # Null if still in conversation
@@ -97,6 +102,7 @@ class ConversationParticipant(Document):
             "conversation_id",
             "user_id",
             [("conversation_id", 1), ("user_id", 1)],  # Compound index
+            [("conversation_id", 1), ("left_at", 1), ("user_id", 1)],  # Covers active-participant fan-out
         ]
 
 
@@ -122,6 +128,7 @@ class Message(Document):
             "sender_id",
             "created_at",
             [("conversation_id", 1), ("created_at", -1)],  # For pagination
+            [("conversation_id", 1), ("deleted_at", 1), ("created_at", -1), ("_id", -1)],  # Keyset pagination
         ]
 
 
@@ -147,6 +154,11 @@ class MessageCreate(BaseModel):
             raise ValueError("Message must have content or media")
 
 
+class ConversationMembers(BaseModel):
+    """Projection of a conversation to its active member IDs."""
+    participant_ids: list[str] = Field(default_factory=list)
+
+
 class ParticipantInfo(BaseModel):
     """Participant info for API responses."""
     user_id: str
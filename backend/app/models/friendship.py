@@ -28,6 +28,10 @@ class Friendship(Document):
     class Settings:
         name = "friendships"
         use_state_management = True
+        indexes = [
+            [("requester_id", 1), ("status", 1)],
+            [("addressee_id", 1), ("status", 1)],
+        ]
 
 
 # Friendship request/response schemas
@@ -43,6 +43,7 @@ class Notification(Document):
     report_id: Optional[str] = None  # Related report (if applicable)
     content: str  # Preview text for the notification
     is_read: bool = Field(default=False)
+    event_count: int = 1  # Events coalesced into this notification (e.g. repeated likes)
     created_at: datetime = Field(default_factory=utc_now)
 
     class Settings:
@@ -71,6 +72,7 @@ class NotificationPublic(BaseModel):
     report_id: Optional[str] = None
     content: str
     is_read: bool
+    event_count: int = 1
     created_at: datetime
 
 
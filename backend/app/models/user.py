@@ -3,10 +3,10 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from beanie import Document, Indexed
+from beanie import Document, Indexed, Insert, Replace, Save, SaveChanges, before_event
 from pydantic import BaseModel, EmailStr, Field
 
-from .base import RankEnum, GameRoleEnum, UserRole
+from .base import RANK_VALUES, RankEnum, GameRoleEnum, UserRole
 
 
 # Shared properties
@@ -114,11 +114,43 @@ class UpdatePassword(BaseModel):
 class User(Document, UserBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()), alias="_id")
     hashed_password: str
+    
+    # Denormalized RANK_VALUES[rank] for numeric rank comparisons
+    rank_value: int = 0
 
     class Settings:
         name = "users"  # MongoDB collection name
         use_state_management = True
 
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def sync_rank_value(self) -> None:
+        """Keep rank_value in step with rank on every write."""
+        self.rank_value = RANK_VALUES.get(self.rank, 0)
+
+
+# Minimal projection for realtime payloads (sender name/avatar)
+class UserProfileProjection(BaseModel):
+    username: str
+    avatar_url: Optional[str] = None
+
+
+# Projection for bulk author/participant enrichment in list endpoints
+class UserSummaryProjection(BaseModel):
+    id: str = Field(alias="_id")
+    username: str
+    avatar_url: Optional[str] = None
+    last_active_at: Optional[datetime] = None
+
+
+# Projection for friend suggestion candidates
+class UserSuggestionProjection(BaseModel):
+    id: str = Field(alias="_id")
+    username: str
+    avatar_url: Optional[str] = None
+    rank: Optional[RankEnum] = None
+    rank_value: int = 0
+    level: Optional[int] = None
+
 
 # Properties to return via API, id is always required
 class UserPublic(UserBase):
@@ -6,10 +6,12 @@ This module provides S3 service with:
 - Dual endpoint support (internal for workers, external for clients)
 """
 
+import asyncio
+import contextlib
 import logging
 import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Optional
 from urllib.parse import quote
 
 import aioboto3
@@ -41,6 +43,12 @@ class ClawCloudS3Service:
             signature_version='s3v4',
             s3={'addressing_style': 'path'}
         )
+        
+        # One long-lived client per endpoint (internal/external), so calls
+        # reuse pooled connections instead of building a client per call
+        self._clients: dict[bool, Any] = {}
+        self._client_stack = contextlib.AsyncExitStack()
+        self._clients_lock = asyncio.Lock()
     
     def _get_session(self) -> aioboto3.Session:
         """Create authenticated aioboto3 session."""
@@ -50,6 +58,29 @@ class ClawCloudS3Service:
             region_name=self.region
         )
     
+    async def _get_client(self, internal: bool = False) -> Any:
+        """Get or create the shared S3 client for an endpoint."""
+        client = self._clients.get(internal)
+        if client is None:
+            async with self._clients_lock:
+                client = self._clients.get(internal)
+                if client is None:
+                    client = await self._client_stack.enter_async_context(
+                        self._get_session().client(
+                            's3',
+                            endpoint_url=self._get_endpoint_url(internal=internal),
+                            config=self._config
+                        )
+                    )
+                    self._clients[internal] = client
+        return client
+    
+    async def close(self) -> None:
+        """Close the shared S3 clients. Call on application shutdown."""
+        self._clients.clear()
+        stack, self._client_stack = self._client_stack, contextlib.AsyncExitStack()
+        await stack.aclose()
+    
     def _get_endpoint_url(self, internal: bool = False) -> str:
         """Get the appropriate endpoint URL."""
         endpoint = self.internal_endpoint if internal else self.external_endpoint
@@ -86,24 +117,17 @@ class ClawCloudS3Service:
         Returns:
             Pre-signed PUT URL for direct upload
         """
-        session = self._get_session()
-        endpoint_url = self._get_endpoint_url(internal=False)
+        s3 = await self._get_client(internal=False)
+        url = await s3.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': self.raw_bucket,
+                'Key': s3_key,
+                'ContentType': content_type
+            },
+            ExpiresIn=expires_in
+        )
         
-        async with session.client(
-            's3',
-            endpoint_url=endpoint_url,
-            config=self._config
-        ) as s3:
-            url = await s3.generate_presigned_url(
-                'put_object',
-                Params={
-                    'Bucket': self.raw_bucket,
-                    'Key': s3_key,
-                    'ContentType': content_type
-                },
-                ExpiresIn=expires_in
-            )
-            
         logger.info(f"Generated pre-signed PUT URL for key: {s3_key}")
         return url
     
@@ -114,23 +138,16 @@ class ClawCloudS3Service:
         expires_in: int = 86400  # 24 hours
     ) -> str:
         """Generate pre-signed GET URL for downloading a file."""
-        session = self._get_session()
-        endpoint_url = self._get_endpoint_url(internal=False)
+        s3 = await self._get_client(internal=False)
+        url = await s3.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': bucket,
+                'Key': s3_key
+            },
+            ExpiresIn=expires_in
+        )
         
-        async with session.client(
-            's3',
-            endpoint_url=endpoint_url,
-            config=self._config
-        ) as s3:
-            url = await s3.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': bucket,
-                    'Key': s3_key
-                },
-                ExpiresIn=expires_in
-            )
-            
         return url
     
     def get_public_url(self, bucket: str, s3_key: str) -> str:
@@ -172,22 +189,15 @@ class ClawCloudS3Service:
         Returns:
             True if successful
         """
-        session = self._get_session()
-        endpoint_url = self._get_endpoint_url(internal=internal)
-        
         try:
-            async with session.client(
-                's3',
-                endpoint_url=endpoint_url,
-                config=self._config
-            ) as s3:
-                await s3.put_object(
-                    Bucket=bucket,
-                    Key=s3_key,
-                    Body=data,
-                    ContentType=content_type
-                )
-                
+            s3 = await self._get_client(internal=internal)
+            await s3.put_object(
+                Bucket=bucket,
+                Key=s3_key,
+                Body=data,
+                ContentType=content_type
+            )
+            
             logger.info(f"Uploaded file to s3://{bucket}/{s3_key}")
             return True
             
@@ -212,18 +222,11 @@ class ClawCloudS3Service:
         Returns:
             File content as bytes, or None if failed
         """
-        session = self._get_session()
-        endpoint_url = self._get_endpoint_url(internal=internal)
-        
         try:
-            async with session.client(
-                's3',
-                endpoint_url=endpoint_url,
-                config=self._config
-            ) as s3:
-                response = await s3.get_object(Bucket=bucket, Key=s3_key)
-                data = await response['Body'].read()
-                
+            s3 = await self._get_client(internal=internal)
+            response = await s3.get_object(Bucket=bucket, Key=s3_key)
+            data = await response['Body'].read()
+            
             logger.info(f"Downloaded file from s3://{bucket}/{s3_key}")
             return data
             
@@ -238,38 +241,24 @@ class ClawCloudS3Service:
         internal: bool = False
     ) -> bool:
         """Check if a file exists in S3."""
-        session = self._get_session()
-        endpoint_url = self._get_endpoint_url(internal=internal)
-        
         try:
-            async with session.client(
-                's3',
-                endpoint_url=endpoint_url,
-                config=self._config
-            ) as s3:
-                await s3.head_object(Bucket=bucket, Key=s3_key)
+            s3 = await self._get_client(internal=internal)
+            await s3.head_object(Bucket=bucket, Key=s3_key)
             return True
         except Exception:
             return False
     
     async def ensure_buckets_exist(self) -> None:
         """Ensure required buckets exist (create if not)."""
-        session = self._get_session()
-        endpoint_url = self._get_endpoint_url(internal=False)
-        
         for bucket in [self.raw_bucket, self.processed_bucket]:
             try:
-                async with session.client(
-                    's3',
-                    endpoint_url=endpoint_url,
-                    config=self._config
-                ) as s3:
-                    try:
-                        await s3.head_bucket(Bucket=bucket)
-                        logger.info(f"Bucket exists: {bucket}")
-                    except Exception:
-                        await s3.create_bucket(Bucket=bucket)
-                        logger.info(f"Created bucket: {bucket}")
+                s3 = await self._get_client(internal=False)
+                try:
+                    await s3.head_bucket(Bucket=bucket)
+                    logger.info(f"Bucket exists: {bucket}")
+                except Exception:
+                    await s3.create_bucket(Bucket=bucket)
+                    logger.info(f"Created bucket: {bucket}")
             except Exception as e:
                 logger.error(f"Failed to ensure bucket {bucket}: {e}")
 
@@ -1,18 +1,38 @@
-"""LangChain Vision API service for profile verification using trustcall."""
+"""LangChain Vision API service for profile verification using Gemini structured output."""
 
+import asyncio
 import base64
+import hashlib
+import io
 import logging
 from datetime import UTC, datetime
+from functools import lru_cache
 from typing import Any
 
+import orjson
+
+from google.api_core.exceptions import (
+    DeadlineExceeded,
+    InternalServerError,
+    ResourceExhausted,
+    ServiceUnavailable,
+)
 from langchain_core.messages import HumanMessage
 from langchain_core.prompts import (
     ChatPromptTemplate,
     HumanMessagePromptTemplate,
     SystemMessagePromptTemplate,
 )
+from langchain_core.runnables import Runnable
 from langchain_google_genai import ChatGoogleGenerativeAI
-from trustcall import create_extractor
+from PIL import Image, UnidentifiedImageError
+from tenacity import (
+    AsyncRetrying,
+    before_sleep_log,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 from app.core.config import settings
 from app.llm.prompts import (
@@ -20,15 +40,46 @@ from app.llm.prompts import (
     PROFILE_EXTRACTION_SYSTEM_PROMPT,
 )
 from app.llm.schemas import ProfileExtraction
+from app.services.redis_client import redis_service
 
 logger = logging.getLogger(__name__)
 
+# Transient Gemini API errors (429/500/503/504) worth retrying
+RETRYABLE_GEMINI_ERRORS = (
+    ResourceExhausted,
+    InternalServerError,
+    ServiceUnavailable,
+    DeadlineExceeded,
+)
+
+# Verified screenshots are cached by content hash so retries of the same
+# upload (double submit, network error) skip the Gemini round-trip
+PROFILE_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Cheap sanity bounds for a phone profile screenshot, checked before Gemini
+MIN_SCREENSHOT_LONG_SIDE = 640
+MIN_ASPECT_RATIO = 0.3
+MAX_ASPECT_RATIO = 3.0
+
+
+def _looks_like_screenshot(image_bytes: bytes) -> bool:
+    """Reject tiny or oddly shaped images using only the image header."""
+    try:
+        # Image.open only parses the header; pixels are never decoded here
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            width, height = img.size
+    except (UnidentifiedImageError, OSError):
+        return False
+    if max(width, height) < MIN_SCREENSHOT_LONG_SIDE or height == 0:
+        return False
+    return MIN_ASPECT_RATIO < width / height < MAX_ASPECT_RATIO
+
 
 class GeminiVisionService:
     """Service for interacting with Google Gemini Vision API via LangChain."""
 
     def __init__(self) -> None:
-        """Initialize Gemini Vision service with LangChain and trustcall."""
+        """Initialize Gemini Vision service with LangChain structured output."""
         if not settings.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY is not set in environment variables")
 
@@ -37,7 +88,9 @@ class GeminiVisionService:
             model="gemini-flash-latest",
             google_api_key=settings.GEMINI_API_KEY,
             temperature=0,
-            max_retries=2,
+            # Retries are handled by _invoke_with_retry; client-side retries
+            # on top would multiply the attempts per request
+            max_retries=0,
         )
 
         # Create extraction prompt template
@@ -46,15 +99,31 @@ class GeminiVisionService:
             HumanMessagePromptTemplate.from_template(PROFILE_EXTRACTION_HUMAN_PROMPT),
         ])
 
-        # Create extraction chain using trustcall
-        self.extraction_chain = self.extraction_prompt | create_extractor(
-            self.llm,
-            tools=[ProfileExtraction],
-            tool_choice="ProfileExtraction",
+        # Gemini JSON response mode constrained to the ProfileExtraction schema;
+        # built once and reused for every request
+        self.extractor = self.llm.with_structured_output(
+            ProfileExtraction,
+            method="json_schema",
         )
 
+        # Create extraction chain
+        self.extraction_chain = self.extraction_prompt | self.extractor
+
         logger.info("GeminiVisionService initialized with LangChain extraction chain")
 
+    async def _invoke_with_retry(
+        self, extractor: Runnable, messages: list[HumanMessage]
+    ) -> ProfileExtraction | None:
+        """Invoke the extractor, retrying rate-limit and server errors with backoff."""
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(3),
+            wait=wait_exponential_jitter(initial=10, exp_base=1.7),
+            retry=retry_if_exception_type(RETRYABLE_GEMINI_ERRORS),
+            before_sleep=before_sleep_log(logger, logging.WARNING),
+            reraise=True,
+        )
+        return await retrying(extractor.ainvoke, messages)
+
     async def verify_profile_screenshot(
         self, image_bytes: bytes
     ) -> dict[str, Any] | None:
@@ -76,9 +145,25 @@ class GeminiVisionService:
             "credibility_score": int
         }
         """
+        if not _looks_like_screenshot(image_bytes):
+            logger.warning("invalid_image: not a plausible profile screenshot, skipping Gemini")
+            return None
+
+        cache_key = None
+        try:
+            cache_key = f"gemini:profile:{hashlib.sha256(image_bytes).hexdigest()}"
+            cached = await redis_service.client.get(cache_key)
+            if cached:
+                logger.info("Profile verification served from cache")
+                data = orjson.loads(cached)
+                data["verified_at"] = datetime.now(UTC).isoformat()
+                return data
+        except Exception as e:
+            logger.warning(f"Profile verification cache lookup failed: {e}")
+
         try:
-            # Encode image to base64
-            image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+            # Encode image to base64 off the event loop; screenshots run to several MB
+            image_base64 = (await asyncio.to_thread(base64.b64encode, image_bytes)).decode("ascii")
 
             # Create message with image for vision model
             message = HumanMessage(
@@ -91,20 +176,12 @@ class GeminiVisionService:
                 ]
             )
 
-            extractor = create_extractor(
-                self.llm,
-                tools=[ProfileExtraction],
-                tool_choice="ProfileExtraction",
-            )
+            extraction = await self._invoke_with_retry(self.extractor, [message])
 
-            result = await extractor.ainvoke([message])
-
-            if not result.get("responses"):
-                logger.error("No responses from extraction chain")
+            if extraction is None:
+                logger.error("No response from extraction model")
                 return None
 
-            extraction: ProfileExtraction = result["responses"][0]
-
             if not extraction.is_valid:
                 logger.warning(f"Profile extraction invalid: {extraction.error}")
                 return None
@@ -121,6 +198,15 @@ class GeminiVisionService:
             logger.info(
                 f"Successfully verified profile: Rank {data['rank']}, Level {data['level']}"
             )
+
+            if cache_key:
+                try:
+                    await redis_service.client.set(
+                        cache_key, orjson.dumps(data), ex=PROFILE_CACHE_TTL_SECONDS
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to cache profile verification: {e}")
+
             return data
 
         except Exception as e:
@@ -128,5 +214,12 @@ class GeminiVisionService:
             return None
 
 
-# Global instance
-gemini_service = GeminiVisionService()
+@lru_cache(maxsize=1)
+def get_gemini_service() -> GeminiVisionService:
+    """
+    Get the shared Gemini service, creating it on first use.
+
+    Deferred so importing this module never requires GEMINI_API_KEY or pays
+    the LangChain client setup cost in processes that don't verify profiles.
+    """
+    return GeminiVisionService()
@@ -1,25 +1,53 @@
+import hashlib
 import logging
+from datetime import timedelta
+from functools import lru_cache
+
 import livekit.api as api
 from app.core.config import settings
+from app.services.redis_client import redis_service
 
 logger = logging.getLogger(__name__)
 
+# Lifetime of issued join tokens
+TOKEN_TTL = timedelta(hours=6)
+# Cached tokens expire a minute before the JWT itself so clients never get a stale one
+TOKEN_CACHE_TTL_SECONDS = int(TOKEN_TTL.total_seconds()) - 60
+
 class LiveKitService:
     def __init__(self):
         self.api_key = settings.LIVEKIT_API_KEY
         self.api_secret = settings.LIVEKIT_API_SECRET
         self.url = settings.LIVEKIT_URL
 
-    def generate_token(self, room_name: str, identity: str, name: str, metadata: str = None) -> str:
+    @staticmethod
+    def _cache_key(room_name: str, identity: str, name: str, metadata: str) -> str:
+        # Name and metadata are baked into the JWT, so they are part of the key
+        digest = hashlib.sha256(f"{name}\0{metadata}".encode()).hexdigest()[:16]
+        return f"livekit:tok:{room_name}:{identity}:{digest}"
+
+    async def generate_token(self, room_name: str, identity: str, name: str, metadata: str = None) -> str:
         """
         Generate a join token for a LiveKit room.
         Room is created if it doesn't exist.
+        Signed tokens are cached in Redis per (room, identity, name, metadata).
         """
+        metadata = metadata or ""
+        cache_key = self._cache_key(room_name, identity, name, metadata)
+        
+        try:
+            cached = await redis_service.client.get(cache_key)
+            if cached:
+                return cached
+        except Exception as e:
+            logger.warning(f"Failed to read cached LiveKit token: {e}")
+        
         try:
             token = api.AccessToken(self.api_key, self.api_secret) \
                 .with_identity(identity) \
                 .with_name(name) \
-                .with_metadata(metadata or "") \
+                .with_metadata(metadata) \
+                .with_ttl(TOKEN_TTL) \
                 .with_grants(api.VideoGrants(
                     room_join=True,
                     room=room_name,
@@ -30,9 +58,19 @@ class LiveKitService:
                     can_publish_sources=["microphone"]
                 ))
             
-            return token.to_jwt()
+            jwt = token.to_jwt()
         except Exception as e:
             logger.error(f"Error generating LiveKit token: {e}")
             raise
+        
+        try:
+            await redis_service.client.set(cache_key, jwt, ex=TOKEN_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Failed to cache LiveKit token: {e}")
+        
+        return jwt
 
-livekit_service = LiveKitService()
+@lru_cache(maxsize=1)
+def get_livekit_service() -> LiveKitService:
+    """Get the shared LiveKit service, creating it on first use."""
+    return LiveKitService()
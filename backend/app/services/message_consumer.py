@@ -1,27 +1,28 @@
 """Message consumer service for processing messaging events from RabbitMQ."""
 
 import asyncio
-import json
 import logging
-from typing import Any, Callable, Optional
+from typing import Any, Optional
 
 import aio_pika
+import orjson
 from aio_pika import ExchangeType, IncomingMessage
+from beanie import UpdateResponse
+from beanie.operators import Set
 
-from app.core.config import settings
 from app.services.rabbitmq import (
-    get_rabbitmq_channel,
+    get_rabbitmq_connection,
     MESSAGE_EVENTS_EXCHANGE,
     MessageRoutingKey,
 )
 from app.services.redis_client import redis_service
 from app.services.message_service import message_service
+from app.services.user_profile_cache import get_user_profile
 from app.models import (
     Conversation,
-    ConversationParticipant,
+    ConversationMembers,
     Message,
     MessageStatus,
-    User,
 )
 
 logger = logging.getLogger(__name__)
@@ -29,13 +30,32 @@ logger = logging.getLogger(__name__)
 # Queue name for message consumer
 MESSAGE_CONSUMER_QUEUE = "message_consumer"
 
+# Max unacked events in flight. aiormq runs each delivery in its own task,
+# so this is also the bound on concurrently running handlers.
+MESSAGE_CONSUMER_PREFETCH = 64
+
+# Message fields pushed in NEW_MESSAGE events, mapped to their camelCase keys
+MESSAGE_PAYLOAD_FIELDS = {
+    "id": "messageId",
+    "sender_id": "senderId",
+    "content": "content",
+    "type": "messageType",
+    "media": "media",
+    "status": "status",
+    "reply_to_message_id": "replyToMessageId",
+    "created_at": "createdAt",
+}
+MESSAGE_PAYLOAD_INCLUDE = set(MESSAGE_PAYLOAD_FIELDS)
+
 
 class MessageConsumer:
     """Consumer for message events from RabbitMQ."""
     
     def __init__(self):
         self._running = False
+        self._channel: Optional[aio_pika.Channel] = None
         self._queue: Optional[aio_pika.Queue] = None
+        self._consumer_tag: Optional[str] = None
     
     async def start(self) -> None:
         """Start consuming message events."""
@@ -44,17 +64,20 @@ class MessageConsumer:
             return
         
         try:
-            channel = await get_rabbitmq_channel()
+            # Dedicated channel so QoS doesn't affect the shared publisher channel
+            connection = await get_rabbitmq_connection()
+            self._channel = await connection.channel()
+            await self._channel.set_qos(prefetch_count=MESSAGE_CONSUMER_PREFETCH)
             
             # Declare exchange
-            exchange = await channel.declare_exchange(
+            exchange = await self._channel.declare_exchange(
                 MESSAGE_EVENTS_EXCHANGE,
                 ExchangeType.TOPIC,
                 durable=True
             )
             
             # Declare queue
-            self._queue = await channel.declare_queue(
+            self._queue = await self._channel.declare_queue(
                 MESSAGE_CONSUMER_QUEUE,
                 durable=True
             )
@@ -63,7 +86,7 @@ class MessageConsumer:
             await self._queue.bind(exchange, routing_key="message.*")
             
             # Start consuming
-            await self._queue.consume(self._process_message)
+            self._consumer_tag = await self._queue.consume(self._process_message)
             
             self._running = True
             logger.info("Message consumer started")
@@ -75,18 +98,23 @@ class MessageConsumer:
     async def stop(self) -> None:
         """Stop consuming messages."""
         self._running = False
-        if self._queue:
-            await self._queue.cancel(MESSAGE_CONSUMER_QUEUE)
+        if self._queue and self._consumer_tag:
+            await self._queue.cancel(self._consumer_tag)
+        if self._channel and not self._channel.is_closed:
+            await self._channel.close()
+        self._channel = None
+        self._queue = None
+        self._consumer_tag = None
         logger.info("Message consumer stopped")
     
     async def _process_message(self, message: IncomingMessage) -> None:
         """Process incoming message event."""
-        async with message.process():
+        async with message.process(ignore_processed=True):
             try:
                 routing_key = message.routing_key
-                payload = json.loads(message.body.decode())
+                payload = orjson.loads(message.body)
                 
-                logger.info(f"Processing message event: {routing_key}")
+                logger.info("Processing message event: %s", routing_key)
                 
                 if routing_key == MessageRoutingKey.MESSAGE_SENT:
                     await self._handle_message_sent(payload)
@@ -102,6 +130,30 @@ class MessageConsumer:
             except Exception as e:
                 logger.error(f"Error processing message event: {e}")
     
+    async def _get_other_participant_ids(
+        self,
+        conversation_id: str,
+        exclude_user_id: str
+    ) -> list[str]:
+        """Get active participant user IDs in a conversation, except one user."""
+        members = await Conversation.find_one(
+            Conversation.id == conversation_id
+        ).project(ConversationMembers)
+        if not members:
+            return []
+        return [uid for uid in members.participant_ids if uid != exclude_user_id]
+    
+    async def _broadcast(self, user_ids: list[str], payload: dict[str, Any]) -> None:
+        """Push payload to every online user in user_ids in one pipeline."""
+        if not user_ids:
+            return
+        
+        # No presence check first: PUBLISH to a channel without subscribers
+        # costs the same as checking, so offline users are simply skipped
+        # by Redis and the whole fan-out is a single round-trip
+        received = await redis_service.publish_many(user_ids, payload, channel_type="message")
+        logger.debug("Pushed %s to %s online sockets", payload.get('type'), received)
+    
     async def _handle_message_sent(self, payload: dict[str, Any]) -> None:
         """
         Handle MESSAGE_SENT event.
@@ -124,50 +176,31 @@ class MessageConsumer:
             logger.error(f"Message {message_id} not found")
             return
         
-        # Get sender info
-        sender = await User.find_one(User.id == sender_id)
-        sender_username = sender.username if sender else "Unknown"
-        sender_avatar = sender.avatar_url if sender else None
+        # Sender info (cached in Redis) and recipients are independent lookups
+        sender, participant_ids = await asyncio.gather(
+            get_user_profile(sender_id),
+            self._get_other_participant_ids(conversation_id, sender_id),
+        )
+        sender_username = sender["username"] if sender else "Unknown"
+        sender_avatar = sender["avatar_url"] if sender else None
         
         # Build message payload for realtime delivery
         # Use flat structure to match frontend expectations
         message_payload = {
             "type": "NEW_MESSAGE",
             "conversationId": conversation_id,
-            "messageId": msg.id,
-            "senderId": msg.sender_id,
             "senderUsername": sender_username,
             "senderAvatar": sender_avatar,
-            "content": msg.content,
-            "messageType": msg.type.value,
-            "media": [m.model_dump() for m in msg.media] if msg.media else [],
-            "status": msg.status.value,
-            "replyToMessageId": msg.reply_to_message_id,
-            "createdAt": msg.created_at.isoformat(),
         }
+        dumped = msg.model_dump(mode="json", include=MESSAGE_PAYLOAD_INCLUDE)
+        for field, value in dumped.items():
+            message_payload[MESSAGE_PAYLOAD_FIELDS[field]] = value
         
-        # Get all participants except sender
-        participants = await ConversationParticipant.find(
-            ConversationParticipant.conversation_id == conversation_id,
-            ConversationParticipant.user_id != sender_id,
-            ConversationParticipant.left_at == None,
-        ).to_list()
-        
-        # Push to each recipient via Redis
-        for participant in participants:
-            user_id = participant.user_id
-            
-            # Check if user is online
-            is_online = await redis_service.is_user_online(user_id)
-            
-            if is_online:
-                # Push via Redis Pub/Sub
-                await redis_service.publish_to_user(
-                    user_id,
-                    "message",
-                    message_payload
-                )
-                logger.info(f"Pushed message to user {user_id}")
+        # Push to all online recipients via Redis
+        await self._broadcast(
+            participant_ids,
+            message_payload
+        )
         
         # Send ACK to sender
         ack_payload = {
@@ -181,22 +214,25 @@ class MessageConsumer:
         if is_sender_online:
             await redis_service.publish_to_user(sender_id, "message", ack_payload)
         
-        logger.info(f"Processed MESSAGE_SENT for message {message_id}")
+        logger.info("Processed MESSAGE_SENT for message %s", message_id)
     
     async def _handle_message_delivered(self, payload: dict[str, Any]) -> None:
         """Handle MESSAGE_DELIVERED event - update message status."""
         message_id = payload.get("message_id")
-        user_id = payload.get("user_id")
         
         if not message_id:
             return
         
-        # Update message status
-        msg = await Message.find_one(Message.id == message_id)
-        if msg and msg.status == MessageStatus.SENT:
-            msg.status = MessageStatus.DELIVERED
-            await msg.save()
-            
+        # Atomically move SENT -> DELIVERED; None if already delivered/seen,
+        # so concurrent DELIVERED events only notify the sender once
+        msg = await Message.find_one(
+            Message.id == message_id,
+            Message.status == MessageStatus.SENT,
+        ).update(
+            Set({Message.status: MessageStatus.DELIVERED}),
+            response_type=UpdateResponse.NEW_DOCUMENT,
+        )
+        if msg:
             # Notify sender
             sender_online = await redis_service.is_user_online(msg.sender_id)
             if sender_online:
@@ -210,7 +246,7 @@ class MessageConsumer:
                     }
                 )
         
-        logger.info(f"Processed MESSAGE_DELIVERED for message {message_id}")
+        logger.info("Processed MESSAGE_DELIVERED for message %s", message_id)
     
     async def _handle_message_seen(self, payload: dict[str, Any]) -> None:
         """Handle MESSAGE_SEEN event - update last seen and notify."""
@@ -226,16 +262,16 @@ class MessageConsumer:
             conversation_id, user_id, message_id
         )
         
-        # Get user info
-        user = await User.find_one(User.id == user_id)
-        username = user.username if user else "Unknown"
+        # Username is denormalized by the producer; fall back for older events
+        username = payload.get("username")
+        if not username:
+            user = await get_user_profile(user_id)
+            username = user["username"] if user else "Unknown"
         
         # Notify other participants
-        participants = await ConversationParticipant.find(
-            ConversationParticipant.conversation_id == conversation_id,
-            ConversationParticipant.user_id != user_id,
-            ConversationParticipant.left_at == None,
-        ).to_list()
+        participant_ids = await self._get_other_participant_ids(
+            conversation_id, user_id
+        )
         
         seen_payload = {
             "type": "MESSAGE_SEEN",
@@ -245,16 +281,12 @@ class MessageConsumer:
             "lastSeenMessageId": message_id,
         }
         
-        for participant in participants:
-            is_online = await redis_service.is_user_online(participant.user_id)
-            if is_online:
-                await redis_service.publish_to_user(
-                    participant.user_id,
-                    "message",
-                    seen_payload
-                )
+        await self._broadcast(
+            participant_ids,
+            seen_payload
+        )
         
-        logger.info(f"Processed MESSAGE_SEEN for conversation {conversation_id}")
+        logger.info("Processed MESSAGE_SEEN for conversation %s", conversation_id)
     
     async def _handle_typing(self, payload: dict[str, Any]) -> None:
         """Handle TYPING event - broadcast to conversation participants."""
@@ -264,16 +296,16 @@ class MessageConsumer:
         if not all([conversation_id, user_id]):
             return
         
-        # Get user info
-        user = await User.find_one(User.id == user_id)
-        username = user.username if user else "Unknown"
+        # Username is denormalized by the producer; fall back for older events
+        username = payload.get("username")
+        if not username:
+            user = await get_user_profile(user_id)
+            username = user["username"] if user else "Unknown"
         
         # Broadcast to other participants
-        participants = await ConversationParticipant.find(
-            ConversationParticipant.conversation_id == conversation_id,
-            ConversationParticipant.user_id != user_id,
-            ConversationParticipant.left_at == None,
-        ).to_list()
+        participant_ids = await self._get_other_participant_ids(
+            conversation_id, user_id
+        )
         
         typing_payload = {
             "type": "TYPING",
@@ -282,16 +314,12 @@ class MessageConsumer:
             "username": username,
         }
         
-        for participant in participants:
-            is_online = await redis_service.is_user_online(participant.user_id)
-            if is_online:
-                await redis_service.publish_to_user(
-                    participant.user_id,
-                    "message",
-                    typing_payload
-                )
+        await self._broadcast(
+            participant_ids,
+            typing_payload
+        )
         
-        logger.debug(f"Broadcast typing indicator for user {user_id}")
+        logger.debug("Broadcast typing indicator for user %s", user_id)
 
 
 # Global consumer instance
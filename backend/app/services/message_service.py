@@ -1,15 +1,20 @@
 """Message service for conversation and messaging business logic."""
 
+import asyncio
+import base64
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 
+from beanie import BulkWriter
+
 from app.models import (
     Conversation,
     ConversationParticipant,
     ConversationType,
     ConversationCreate,
     ConversationListItem,
+    ConversationMembers,
     ConversationPublic,
     ConversationsResponse,
     Message,
@@ -21,6 +26,7 @@ from app.models import (
     ParticipantInfo,
     ParticipantRole,
     User,
+    UserSummaryProjection,
     utc_now,
 )
 from app.services.redis_client import redis_service
@@ -28,6 +34,45 @@ from app.services.redis_client import redis_service
 logger = logging.getLogger(__name__)
 
 
+def _encode_cursor(timestamp: datetime, doc_id: str) -> str:
+    """
+    Build an opaque keyset cursor from the last item's sort key and ID.
+
+    Mongo stores datetimes at millisecond precision (naive UTC when read
+    back), so epoch milliseconds round-trip exactly.
+    """
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    millis = round(timestamp.timestamp() * 1000)
+    return base64.urlsafe_b64encode(f"{millis}:{doc_id}".encode()).decode().rstrip("=")
+
+
+def _keyset_filter(field: str, cursor: str) -> dict:
+    """
+    Filter for items strictly after the cursor in (field, _id) descending order.
+
+    The _id tie-break keeps pages stable when several items share a timestamp.
+    Raw ISO timestamps from older clients (recognisable by their ":",
+    which never appears in base64) are still accepted and filter on the
+    timestamp alone, as before.
+    """
+    if ":" in cursor:
+        cursor_dt = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
+        doc_id = ""
+    else:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        millis, _, doc_id = base64.urlsafe_b64decode(padded).decode().partition(":")
+        cursor_dt = datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc)
+    if not doc_id:
+        return {field: {"$lt": cursor_dt}}
+    return {
+        "$or": [
+            {field: {"$lt": cursor_dt}},
+            {field: cursor_dt, "_id": {"$lt": doc_id}},
+        ]
+    }
+
+
 class MessageService:
     """Service for handling messaging operations."""
 
@@ -75,38 +120,56 @@ class MessageService:
         logger.info(f"Created {data.type} conversation {conversation.id}")
         return conversation
 
+    async def backfill_conversation_members(self) -> int:
+        """
+        Populate participant_ids and unread on conversations created before
+        those fields existed. Only conversations missing participant_ids are
+        touched, so this is safe to run on every startup; all updates go to
+        the server in a single bulk write.
+        """
+        pending = await Conversation.find(
+            {"participant_ids": {"$exists": False}}
+        ).to_list()
+        if not pending:
+            return 0
+        
+        conv_ids = [c.id for c in pending]
+        participants = await ConversationParticipant.find(
+            {"conversation_id": {"$in": conv_ids}},
+            ConversationParticipant.left_at == None,
+        ).to_list()
+        
+        member_ids: dict[str, list[str]] = {cid: [] for cid in conv_ids}
+        unread: dict[str, dict[str, int]] = {cid: {} for cid in conv_ids}
+        for p in participants:
+            member_ids[p.conversation_id].append(p.user_id)
+            if p.unread_count:
+                unread[p.conversation_id][p.user_id] = p.unread_count
+        
+        # Filter again on the missing field so a replica racing this one
+        # does not overwrite members already set
+        async with BulkWriter(ordered=False) as bulk_writer:
+            for cid in conv_ids:
+                await Conversation.find_one(
+                    {"_id": cid, "participant_ids": {"$exists": False}}
+                ).update(
+                    {"$set": {"participant_ids": member_ids[cid], "unread": unread[cid]}},
+                    bulk_writer=bulk_writer,
+                )
+        
+        logger.info(f"Backfilled members for {len(conv_ids)} conversations")
+        return len(conv_ids)
+
     async def get_direct_conversation(
         self,
         user_id_1: str,
         user_id_2: str,
     ) -> Optional[Conversation]:
         """Find existing direct conversation between two users."""
-        # Find conversations where both users are participants
-        user1_convs = await ConversationParticipant.find(
-            ConversationParticipant.user_id == user_id_1,
-            ConversationParticipant.left_at == None,
-        ).to_list()
-        
-        user1_conv_ids = {p.conversation_id for p in user1_convs}
-        
-        for conv_id in user1_conv_ids:
-            # Check if user2 is also in this conversation
-            user2_in = await ConversationParticipant.find_one(
-                ConversationParticipant.conversation_id == conv_id,
-                ConversationParticipant.user_id == user_id_2,
-                ConversationParticipant.left_at == None,
-            )
-            
-            if user2_in:
-                # Check if it's a DIRECT conversation
-                conv = await Conversation.find_one(
-                    Conversation.id == conv_id,
-                    Conversation.type == ConversationType.DIRECT,
-                )
-                if conv:
-                    return conv
-        
-        return None
+        return await Conversation.find_one(
+            {"participant_ids": {"$all": [user_id_1, user_id_2]}},
+            Conversation.type == ConversationType.DIRECT,
+        )
 
     async def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
         """Get a conversation by ID."""
@@ -119,36 +182,16 @@ class MessageService:
         limit: int = 20,
     ) -> ConversationsResponse:
         """Get all conversations for a user (excludes team chats)."""
-        # Get participant records
-        query_conditions = [
-            ConversationParticipant.user_id == user_id,
-            ConversationParticipant.left_at == None,
-        ]
-        
-        participants = await ConversationParticipant.find(*query_conditions).to_list()
-        conv_ids = [p.conversation_id for p in participants]
-        unread_map = {p.conversation_id: p.unread_count for p in participants}
-        
-        if not conv_ids:
-            return ConversationsResponse(data=[], next_cursor=None, has_more=False)
-        
-        # Get conversations using $in operator - use _id for raw MongoDB query
-        # Exclude team chats (team_id is null or doesn't exist)
-        conv_query = {
-            "_id": {"$in": conv_ids},
-            "$or": [
-                {"team_id": None},
-                {"team_id": {"$exists": False}},
-            ]
-        }
+        # Exclude team chats; a null match also covers a missing team_id,
+        # so no $or is needed and the (participant_ids, updated_at) index applies
+        conv_query = {"participant_ids": user_id, "team_id": None}
         
         if cursor:
-            cursor_dt = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
-            conv_query["updated_at"] = {"$lt": cursor_dt}
+            conv_query.update(_keyset_filter("updated_at", cursor))
         
         conversations = await Conversation.find(
             conv_query
-        ).sort(-Conversation.updated_at).limit(limit + 1).to_list()
+        ).sort(-Conversation.updated_at, "-_id").limit(limit + 1).to_list()
         
         has_more = len(conversations) > limit
         if has_more:
@@ -156,13 +199,42 @@ class MessageService:
         
         next_cursor = None
         if has_more and conversations:
-            next_cursor = conversations[-1].updated_at.isoformat()
+            last = conversations[-1]
+            next_cursor = _encode_cursor(last.updated_at, last.id)
         
-        # Build response
-        items = []
+        unread_map = {c.id: c.unread.get(user_id, 0) for c in conversations}
+        
+        # Resolve the other user of every direct chat in bulk
+        other_user_ids: dict[str, str] = {}
         for conv in conversations:
-            item = await self._build_conversation_list_item(conv, user_id, unread_map)
-            items.append(item)
+            if conv.type == ConversationType.DIRECT:
+                for pid in conv.participant_ids:
+                    if pid != user_id:
+                        other_user_ids[conv.id] = pid
+                        break
+        
+        user_map: dict[str, UserSummaryProjection] = {}
+        online_map: dict[str, bool] = {}
+        if other_user_ids:
+            distinct_ids = list(set(other_user_ids.values()))
+            users = await User.find(
+                {"_id": {"$in": distinct_ids}}
+            ).project(UserSummaryProjection).to_list()
+            user_map = {u.id: u for u in users}
+            # Check online status from Redis
+            try:
+                flags = await redis_service.are_users_online(distinct_ids)
+                online_map = dict(zip(distinct_ids, flags, strict=True))
+            except Exception:
+                pass  # Redis might not be connected, default to offline
+        
+        # Build response
+        items = [
+            self._build_conversation_list_item(
+                conv, unread_map, other_user_ids, user_map, online_map
+            )
+            for conv in conversations
+        ]
         
         return ConversationsResponse(
             data=items,
@@ -170,38 +242,30 @@ class MessageService:
             has_more=has_more,
         )
 
-    async def _build_conversation_list_item(
+    def _build_conversation_list_item(
         self,
         conv: Conversation,
-        current_user_id: str,
         unread_map: dict[str, int],
+        other_user_ids: dict[str, str],
+        user_map: dict[str, UserSummaryProjection],
+        online_map: dict[str, bool],
     ) -> ConversationListItem:
-        """Build a conversation list item for display."""
+        """Build a conversation list item for display from preloaded lookups."""
         name = conv.name
         avatar_url = conv.avatar_url
         is_online = False
         last_active_at = None
         other_user_id = None
         
-        # For direct chats, get other user's info
+        # For direct chats, use other user's info
         if conv.type == ConversationType.DIRECT:
-            other_participant = await ConversationParticipant.find_one(
-                ConversationParticipant.conversation_id == conv.id,
-                ConversationParticipant.user_id != current_user_id,
-                ConversationParticipant.left_at == None,
-            )
-            if other_participant:
-                other_user = await User.find_one(User.id == other_participant.user_id)
-                if other_user:
-                    name = other_user.username
-                    avatar_url = other_user.avatar_url
-                    last_active_at = other_user.last_active_at
-                    other_user_id = other_user.id
-                    # Check online status from Redis
-                    try:
-                        is_online = await redis_service.is_user_online(other_user.id)
-                    except Exception:
-                        pass  # Redis might not be connected, default to offline
+            other_user = user_map.get(other_user_ids.get(conv.id))
+            if other_user:
+                name = other_user.username
+                avatar_url = other_user.avatar_url
+                last_active_at = other_user.last_active_at
+                other_user_id = other_user.id
+                is_online = online_map.get(other_user.id, False)
         
         return ConversationListItem(
             id=conv.id,
@@ -237,8 +301,14 @@ class MessageService:
                 existing.left_at = None
                 existing.joined_at = utc_now()
                 existing.role = role
-                await existing.save()
-                return existing
+                await ConversationParticipant.find_one(
+                    ConversationParticipant.id == existing.id
+                ).update({"$set": {
+                    "left_at": None,
+                    "joined_at": existing.joined_at,
+                    "role": role,
+                }})
+                await self._add_member_id(conversation_id, user_id)
             return existing
         
         participant = ConversationParticipant(
@@ -247,6 +317,7 @@ class MessageService:
             role=role,
         )
         await participant.insert()
+        await self._add_member_id(conversation_id, user_id)
         return participant
 
     async def remove_participant(
@@ -255,19 +326,29 @@ class MessageService:
         user_id: str,
     ) -> bool:
         """Remove a participant from a conversation (soft delete)."""
-        participant = await ConversationParticipant.find_one(
+        result = await ConversationParticipant.find_one(
             ConversationParticipant.conversation_id == conversation_id,
             ConversationParticipant.user_id == user_id,
             ConversationParticipant.left_at == None,
-        )
+        ).update({"$set": {"left_at": utc_now()}})
         
-        if not participant:
+        if not result.modified_count:
             return False
         
-        participant.left_at = utc_now()
-        await participant.save()
+        await Conversation.find_one(Conversation.id == conversation_id).update({
+            "$pull": {"participant_ids": user_id},
+            "$unset": {f"unread.{user_id}": ""},
+        })
+        await self._invalidate_members(conversation_id)
         return True
 
+    async def _add_member_id(self, conversation_id: str, user_id: str) -> None:
+        """Record an active member on the conversation document."""
+        await Conversation.find_one(Conversation.id == conversation_id).update(
+            {"$addToSet": {"participant_ids": user_id}}
+        )
+        await self._invalidate_members(conversation_id)
+
     async def get_participants(self, conversation_id: str) -> list[ParticipantInfo]:
         """Get all active participants in a conversation."""
         participants = await ConversationParticipant.find(
@@ -275,35 +356,66 @@ class MessageService:
             ConversationParticipant.left_at == None,
         ).to_list()
         
+        if not participants:
+            return []
+        
+        # Profiles and online flags are independent; fetch them concurrently
+        user_ids = [p.user_id for p in participants]
+        users, online_flags = await asyncio.gather(
+            User.find({"_id": {"$in": user_ids}}).project(UserSummaryProjection).to_list(),
+            redis_service.are_users_online(user_ids),
+            return_exceptions=True,
+        )
+        if isinstance(users, BaseException):
+            raise users
+        user_map = {u.id: u for u in users}
+        # Redis might not be connected, default to offline
+        online_map = (
+            {} if isinstance(online_flags, BaseException)
+            else dict(zip(user_ids, online_flags, strict=True))
+        )
+        
         result = []
         for p in participants:
-            user = await User.find_one(User.id == p.user_id)
+            user = user_map.get(p.user_id)
             if user:
-                # Check online status from Redis
-                is_online = False
-                try:
-                    is_online = await redis_service.is_user_online(p.user_id)
-                except Exception:
-                    pass  # Redis might not be connected, default to offline
-                
                 result.append(ParticipantInfo(
                     user_id=p.user_id,
                     username=user.username,
                     avatar_url=user.avatar_url,
                     role=p.role,
-                    is_online=is_online,
+                    is_online=online_map.get(p.user_id, False),
                 ))
         
         return result
 
     async def is_participant(self, conversation_id: str, user_id: str) -> bool:
         """Check if a user is a participant in a conversation."""
-        p = await ConversationParticipant.find_one(
-            ConversationParticipant.conversation_id == conversation_id,
-            ConversationParticipant.user_id == user_id,
-            ConversationParticipant.left_at == None,
-        )
-        return p is not None
+        try:
+            cached = await redis_service.is_conversation_member(conversation_id, user_id)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.warning(f"Membership cache lookup failed: {e}")
+        
+        members = await Conversation.find_one(
+            Conversation.id == conversation_id
+        ).project(ConversationMembers)
+        member_ids = members.participant_ids if members else []
+        
+        try:
+            await redis_service.set_conversation_members(conversation_id, member_ids)
+        except Exception as e:
+            logger.warning(f"Failed to cache conversation members: {e}")
+        
+        return user_id in member_ids
+
+    async def _invalidate_members(self, conversation_id: str) -> None:
+        """Drop the cached member set; it is rebuilt on the next lookup."""
+        try:
+            await redis_service.invalidate_conversation_members(conversation_id)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate conversation members: {e}")
 
     # ============== Message Operations ==============
 
@@ -314,19 +426,22 @@ class MessageService:
         data: MessageCreate,
     ) -> Message:
         """Send a message to a conversation."""
-        # Verify sender is a participant
-        if not await self.is_participant(conversation_id, sender_id):
+        # Load members once; doubles as the participant check
+        members = await Conversation.find_one(
+            Conversation.id == conversation_id
+        ).project(ConversationMembers)
+        if not members or sender_id not in members.participant_ids:
             raise ValueError("User is not a participant in this conversation")
         
         # Determine message type
-        msg_type = MessageType.TEXT
-        if data.media:
-            msg_type = MessageType.MIXED if data.content else MessageType.IMAGE
-            # Check if any video in media
-            for m in data.media:
-                if m.type == "video":
-                    msg_type = MessageType.VIDEO if not data.content else MessageType.MIXED
-                    break
+        if not data.media:
+            msg_type = MessageType.TEXT
+        elif data.content:
+            msg_type = MessageType.MIXED
+        elif any(m.type == "video" for m in data.media):
+            msg_type = MessageType.VIDEO
+        else:
+            msg_type = MessageType.IMAGE
         
         # Create message
         message = Message(
@@ -339,21 +454,23 @@ class MessageService:
         )
         await message.insert()
         
-        # Update conversation
-        conv = await Conversation.find_one(Conversation.id == conversation_id)
-        if conv:
-            conv.last_message_id = message.id
-            conv.last_message_content = data.content[:100] if data.content else "[Media]"
-            conv.last_message_at = message.created_at
-            conv.updated_at = message.created_at
-            await conv.save()
-        
-        # Increment unread count for other participants
-        await ConversationParticipant.find(
-            ConversationParticipant.conversation_id == conversation_id,
-            ConversationParticipant.user_id != sender_id,
-            ConversationParticipant.left_at == None,
-        ).update({"$inc": {"unread_count": 1}})
+        # Update preview and bump unread counts for everyone else in one write
+        update: dict = {
+            "$set": {
+                "last_message_id": message.id,
+                "last_message_content": data.content[:100] if data.content else "[Media]",
+                "last_message_at": message.created_at,
+                "updated_at": message.created_at,
+            }
+        }
+        unread_inc = {
+            f"unread.{uid}": 1
+            for uid in members.participant_ids
+            if uid != sender_id
+        }
+        if unread_inc:
+            update["$inc"] = unread_inc
+        await Conversation.find_one(Conversation.id == conversation_id).update(update)
         
         logger.info(f"Message {message.id} sent in conversation {conversation_id}")
         return message
@@ -371,12 +488,11 @@ class MessageService:
         ]
         
         if cursor:
-            cursor_dt = datetime.fromisoformat(cursor.replace("Z", "+00:00"))
-            query_conditions.append(Message.created_at < cursor_dt)
+            query_conditions.append(_keyset_filter("created_at", cursor))
         
         messages = await Message.find(
             *query_conditions
-        ).sort(-Message.created_at).limit(limit + 1).to_list()
+        ).sort(-Message.created_at, "-_id").limit(limit + 1).to_list()
         
         has_more = len(messages) > limit
         if has_more:
@@ -384,12 +500,19 @@ class MessageService:
         
         next_cursor = None
         if has_more and messages:
-            next_cursor = messages[-1].created_at.isoformat()
+            last = messages[-1]
+            next_cursor = _encode_cursor(last.created_at, last.id)
+        
+        # Enrich with sender info (one bulk query for all distinct senders)
+        sender_ids = list({msg.sender_id for msg in messages})
+        senders = await User.find(
+            {"_id": {"$in": sender_ids}}
+        ).project(UserSummaryProjection).to_list() if sender_ids else []
+        sender_map = {u.id: u for u in senders}
         
-        # Enrich with sender info
         enriched = []
         for msg in messages:
-            sender = await User.find_one(User.id == msg.sender_id)
+            sender = sender_map.get(msg.sender_id)
             enriched.append(MessagePublic(
                 id=msg.id,
                 conversation_id=msg.conversation_id,
@@ -420,24 +543,28 @@ class MessageService:
         message_id: str,
     ) -> None:
         """Mark a conversation as seen up to a message."""
-        participant = await ConversationParticipant.find_one(
-            ConversationParticipant.conversation_id == conversation_id,
-            ConversationParticipant.user_id == user_id,
-        )
-        
-        if participant:
-            participant.last_seen_message_id = message_id
-            participant.unread_count = 0
-            await participant.save()
-            
+        # Membership is answered from the Redis cache; the writes below are
+        # independent of each other and go out together
+        if not await self.is_participant(conversation_id, user_id):
+            return
+        
+        await asyncio.gather(
+            ConversationParticipant.find_one(
+                ConversationParticipant.conversation_id == conversation_id,
+                ConversationParticipant.user_id == user_id,
+            ).update({"$set": {"last_seen_message_id": message_id}}),
+            Conversation.find_one(Conversation.id == conversation_id).update(
+                {"$set": {f"unread.{user_id}": 0}}
+            ),
             # Update message status to SEEN for messages sent by others
-            await Message.find(
+            Message.find(
                 Message.conversation_id == conversation_id,
                 Message.sender_id != user_id,
                 Message.status != MessageStatus.SEEN,
-            ).update({"$set": {"status": MessageStatus.SEEN}})
-            
-            logger.info(f"User {user_id} marked conversation {conversation_id} as seen")
+            ).update({"$set": {"status": MessageStatus.SEEN}}),
+        )
+        
+        logger.info(f"User {user_id} marked conversation {conversation_id} as seen")
 
 
 # Global service instance
@@ -5,24 +5,42 @@ and routes to online users via Redis Pub/Sub.
 """
 
 import asyncio
-import json
 import logging
 from typing import Any, Optional
 
 import aio_pika
+import orjson
 from aio_pika import ExchangeType, Message
 from aio_pika.abc import AbstractIncomingMessage
 
 from app.core.config import settings
-from app.models import Notification, NotificationType, User
+from app.models import Notification, NotificationType
 from app.services.redis_client import redis_service
 from app.services.rabbitmq import EVENTS_EXCHANGE, get_rabbitmq_connection
+from app.services.user_profile_cache import get_user_profile
 
 logger = logging.getLogger(__name__)
 
 # Queue name for notification consumer
 NOTIFICATION_QUEUE = "notification-service.queue"
 
+# Max unacked events in flight. aiormq runs each delivery in its own task,
+# so this also bounds concurrent handlers; sized to the Mongo pool.
+NOTIFICATION_CONSUMER_PREFETCH = 50
+
+# Notification inserts are buffered and written with insert_many once the
+# batch is full or the window since the first buffered item has elapsed
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_BATCH_WINDOW_SECONDS = 0.02
+
+# Repeats of these events on the same post within the window are folded into
+# the recipient's existing unread notification instead of creating new ones
+COALESCED_NOTIFICATION_TYPES = {
+    NotificationType.POST_LIKED,
+    NotificationType.POST_SHARED,
+}
+NOTIFICATION_COALESCE_WINDOW_SECONDS = 60
+
 # Routing key to notification type mapping
 ROUTING_KEY_TO_TYPE = {
     "post.liked": NotificationType.POST_LIKED,
@@ -37,6 +55,21 @@ ROUTING_KEY_TO_TYPE = {
 }
 
 
+# Notification content templates, formatted with the actor's username
+NOTIFICATION_CONTENT_TEMPLATES = {
+    NotificationType.POST_LIKED: "{actor} đã thích bài viết của bạn",
+    NotificationType.POST_COMMENTED: "{actor} đã bình luận bài viết của bạn",
+    NotificationType.POST_SHARED: "{actor} đã chia sẻ bài viết của bạn",
+    NotificationType.MENTIONED: "{actor} đã nhắc đến bạn trong một bình luận",
+    NotificationType.REPLY_THREAD: "{actor} đã trả lời bình luận của bạn",
+    # Team notifications
+    NotificationType.TEAM_JOIN_REQUEST: "{actor} đã xin tham gia phòng của bạn",
+    NotificationType.TEAM_REQUEST_APPROVED: "{actor} đã chấp nhận bạn vào phòng",
+    NotificationType.TEAM_REQUEST_REJECTED: "{actor} đã từ chối bạn vào phòng",
+}
+DEFAULT_CONTENT_TEMPLATE = "{actor} đã tương tác với bạn"
+
+
 class NotificationConsumer:
     """Consumer service for notification events from RabbitMQ."""
     
@@ -46,6 +79,8 @@ class NotificationConsumer:
         self._queue: Optional[aio_pika.Queue] = None
         self._consumer_tag: Optional[str] = None
         self._running = False
+        self._insert_queue: asyncio.Queue[tuple[Notification, asyncio.Future]] = asyncio.Queue()
+        self._flush_task: Optional[asyncio.Task] = None
     
     async def start(self) -> None:
         """Start consuming notification events from RabbitMQ."""
@@ -59,7 +94,7 @@ class NotificationConsumer:
             
             # Create dedicated channel for consumer
             self._channel = await self._connection.channel()
-            await self._channel.set_qos(prefetch_count=10)  # Control concurrency
+            await self._channel.set_qos(prefetch_count=NOTIFICATION_CONSUMER_PREFETCH)
             
             # Declare exchange
             exchange = await self._channel.declare_exchange(
@@ -84,6 +119,9 @@ class NotificationConsumer:
                 await self._queue.bind(exchange, routing_key=pattern)
                 logger.info(f"Bound queue to pattern: {pattern}")
             
+            # Start batch writer before any handler can enqueue
+            self._flush_task = asyncio.create_task(self._flush_loop())
+            
             # Start consuming
             self._consumer_tag = await self._queue.consume(self._process_message)
             self._running = True
@@ -108,6 +146,22 @@ class NotificationConsumer:
         except Exception as e:
             logger.error(f"Error stopping consumer: {e}")
         
+        # Stop the batch writer (it writes the batch it holds before exiting),
+        # then write whatever is still queued so no handler is left waiting
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        
+        batch = []
+        while not self._insert_queue.empty():
+            batch.append(self._insert_queue.get_nowait())
+        if batch:
+            await self._write_batch(batch)
+        
         # Note: Don't close connection here as it's shared with publisher
         self._channel = None
         self._queue = None
@@ -118,10 +172,10 @@ class NotificationConsumer:
         async with message.process():
             try:
                 # Parse message
-                body = json.loads(message.body.decode())
+                body = orjson.loads(message.body)
                 routing_key = message.routing_key
                 
-                logger.debug(f"Processing event {routing_key}: {body}")
+                logger.debug("Processing event %s: %s", routing_key, body)
                 
                 # Get notification type
                 notification_type = ROUTING_KEY_TO_TYPE.get(routing_key)
@@ -145,9 +199,19 @@ class NotificationConsumer:
                     logger.debug("Skipping self-notification")
                     return
                 
-                # Get actor info for content preview
-                actor = await User.find_one(User.id == actor_id)
-                actor_username = actor.username if actor else "Someone"
+                # Actor lookup (cached in Redis) and recipient presence are independent
+                actor, is_online = await asyncio.gather(
+                    get_user_profile(actor_id),
+                    redis_service.is_user_online(user_id),
+                    return_exceptions=True,
+                )
+                if isinstance(actor, BaseException):
+                    raise actor
+                if isinstance(is_online, BaseException):
+                    # Still persist the notification; it is fetched on next load
+                    logger.warning(f"Presence check failed for {user_id}: {is_online}")
+                    is_online = False
+                actor_username = actor["username"] if actor else "Someone"
                 
                 # Generate notification content based on type
                 content = self._generate_content(notification_type, actor_username)
@@ -162,13 +226,16 @@ class NotificationConsumer:
                     team_id=team_id,
                     content=content,
                 )
-                await notification.insert()
                 
-                logger.info(f"Saved notification: {notification.id} ({notification_type.value})")
+                if await self._coalesce(notification):
+                    logger.debug("Coalesced %s for user %s", notification_type.value, user_id)
+                    return
                 
-                # Check if user is online and publish to Redis
-                is_online = await redis_service.is_user_online(user_id)
+                await self._insert_batched(notification)
                 
+                logger.info("Saved notification: %s (%s)", notification.id, notification_type.value)
+                
+                # Publish to Redis if the recipient is online
                 if is_online:
                     # Prepare notification payload for realtime delivery
                     payload = {
@@ -176,7 +243,7 @@ class NotificationConsumer:
                         "type": notification_type.value,
                         "actor_id": actor_id,
                         "actor_username": actor_username,
-                        "actor_avatar": actor.avatar_url if actor else None,
+                        "actor_avatar": actor["avatar_url"] if actor else None,
                         "content": content,
                         "post_id": post_id,
                         "comment_id": comment_id,
@@ -184,30 +251,131 @@ class NotificationConsumer:
                         "is_read": False,
                     }
                     
-                    await redis_service.publish_notification(user_id, payload)
-                    logger.debug(f"Published realtime notification to user {user_id}")
+                    # Delivery count is not needed; publish in the next pipeline
+                    redis_service.publish_notification_nowait(user_id, payload)
+                    logger.debug("Queued realtime notification to user %s", user_id)
                 else:
-                    logger.debug(f"User {user_id} is offline, notification saved to DB only")
+                    logger.debug("User %s is offline, notification saved to DB only", user_id)
                 
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 logger.error(f"Invalid JSON in message: {e}")
             except Exception as e:
                 logger.error(f"Error processing notification event: {e}", exc_info=True)
     
+    async def _coalesce(self, notification: Notification) -> bool:
+        """
+        Fold a repeated event into the recipient's existing notification.
+        
+        Returns True if an existing unread notification absorbed this event,
+        in which case nothing is inserted or published.
+        """
+        if notification.type not in COALESCED_NOTIFICATION_TYPES or not notification.post_id:
+            return False
+        
+        slot = f"{notification.user_id}:{notification.post_id}:{notification.type.value}"
+        try:
+            owner_id = await redis_service.claim_notification_slot(
+                slot, notification.id, ex=NOTIFICATION_COALESCE_WINDOW_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"Notification coalescing unavailable: {e}")
+            return False
+        
+        if owner_id is None:
+            return False
+        
+        # Only unread notifications absorb repeats; the owner may also still
+        # be waiting in the insert batch, in which case nothing matches
+        result = await Notification.find_one(
+            Notification.id == owner_id,
+            Notification.is_read == False,
+        ).update({
+            "$inc": {"event_count": 1},
+            "$set": {
+                "actor_id": notification.actor_id,
+                "content": notification.content,
+                "created_at": notification.created_at,
+            },
+        })
+        if result.modified_count:
+            return True
+        
+        try:
+            await redis_service.set_notification_slot(
+                slot, notification.id, ex=NOTIFICATION_COALESCE_WINDOW_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"Failed to hand over notification slot: {e}")
+        return False
+    
+    async def _insert_batched(self, notification: Notification) -> None:
+        """
+        Queue a notification for the next bulk insert and wait until it is written.
+        
+        The handler only returns (and the AMQP message is only acked) after
+        the batch containing this notification has been persisted.
+        """
+        if self._flush_task is None:
+            # Stopped: handlers still finishing write directly
+            await notification.insert()
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._insert_queue.put((notification, future))
+        await future
+    
+    async def _flush_loop(self) -> None:
+        """Drain queued notifications into insert_many batches."""
+        loop = asyncio.get_running_loop()
+        batch: list[tuple[Notification, asyncio.Future]] = []
+        write: Optional[asyncio.Future] = None
+        try:
+            while True:
+                batch = [await self._insert_queue.get()]
+                deadline = loop.time() + NOTIFICATION_BATCH_WINDOW_SECONDS
+                while len(batch) < NOTIFICATION_BATCH_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._insert_queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                # Shielded so cancellation in stop() does not interrupt a
+                # write whose handlers are waiting on it
+                write = asyncio.ensure_future(self._write_batch(batch))
+                batch = []
+                await asyncio.shield(write)
+                write = None
+        except asyncio.CancelledError:
+            # Finish the write in flight and the batch being collected, so
+            # stop() returns only once their handlers are resolved
+            if write is not None:
+                await write
+            if batch:
+                await self._write_batch(batch)
+            raise
+    
+    @staticmethod
+    async def _write_batch(batch: list[tuple[Notification, asyncio.Future]]) -> None:
+        """Insert a batch of notifications and resolve their waiting futures."""
+        try:
+            await Notification.insert_many([n for n, _ in batch])
+        except Exception as e:
+            logger.error(f"Failed to insert {len(batch)} notifications: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+    
     def _generate_content(self, notification_type: NotificationType, actor_username: str) -> str:
         """Generate notification content text based on type."""
-        content_map = {
-            NotificationType.POST_LIKED: f"{actor_username} đã thích bài viết của bạn",
-            NotificationType.POST_COMMENTED: f"{actor_username} đã bình luận bài viết của bạn",
-            NotificationType.POST_SHARED: f"{actor_username} đã chia sẻ bài viết của bạn",
-            NotificationType.MENTIONED: f"{actor_username} đã nhắc đến bạn trong một bình luận",
-            NotificationType.REPLY_THREAD: f"{actor_username} đã trả lời bình luận của bạn",
-            # Team notifications
-            NotificationType.TEAM_JOIN_REQUEST: f"{actor_username} đã xin tham gia phòng của bạn",
-            NotificationType.TEAM_REQUEST_APPROVED: f"{actor_username} đã chấp nhận bạn vào phòng",
-            NotificationType.TEAM_REQUEST_REJECTED: f"{actor_username} đã từ chối bạn vào phòng",
-        }
-        return content_map.get(notification_type, f"{actor_username} đã tương tác với bạn")
+        template = NOTIFICATION_CONTENT_TEMPLATES.get(notification_type, DEFAULT_CONTENT_TEMPLATE)
+        return template.format(actor=actor_username)
 
 
 # Singleton instance
@@ -3,17 +3,24 @@
 Provides async publisher for sending video transcode jobs and notification events to queues.
 """
 
-import json
+import asyncio
 import logging
+import weakref
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from typing import Any, Optional
 
 import aio_pika
+import orjson
 from aio_pika import Message, DeliveryMode, ExchangeType
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Datetimes serialize natively as ISO-8601 with a "Z" suffix
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
 # Queue names
 VIDEO_TRANSCODE_QUEUE = "video.transcode"
 
@@ -40,88 +47,154 @@ class MessageRoutingKey:
     MESSAGE_SEEN = "message.seen"
     TYPING = "message.typing"
 
-# Global connection
-_connection: Optional[aio_pika.Connection] = None
-_channel: Optional[aio_pika.Channel] = None
-_events_exchange: Optional[aio_pika.Exchange] = None
-_message_events_exchange: Optional[aio_pika.Exchange] = None
+# Ephemeral message events: published without broker confirms or persistence,
+# since a lost typing indicator is superseded by the next one within seconds
+TRANSIENT_MESSAGE_EVENTS = frozenset({MessageRoutingKey.TYPING})
+
+@dataclass
+class _RabbitMQState:
+    """Connection, channels and exchange handles owned by one event loop."""
+    connection: Optional[aio_pika.Connection] = None
+    channel: Optional[aio_pika.Channel] = None
+    events_exchange: Optional[aio_pika.Exchange] = None
+    message_events_exchange: Optional[aio_pika.Exchange] = None
+    transient_channel: Optional[aio_pika.Channel] = None
+    transient_message_events_exchange: Optional[aio_pika.Exchange] = None
+    # Guard lazy setup so concurrent first callers share one connection,
+    # one channel and one declaration of each exchange
+    connection_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    channel_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    exchange_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+# aio_pika objects and asyncio locks are bound to the loop that created them,
+# so each event loop gets its own state; entries go away with their loop
+_states: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _RabbitMQState]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_state() -> _RabbitMQState:
+    """Get the RabbitMQ state of the running event loop."""
+    loop = asyncio.get_running_loop()
+    state = _states.get(loop)
+    if state is None:
+        state = _states[loop] = _RabbitMQState()
+    return state
 
 
 async def get_rabbitmq_connection() -> aio_pika.Connection:
     """Get or create RabbitMQ connection."""
-    global _connection
+    state = _get_state()
     
-    if _connection is None or _connection.is_closed:
-        _connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
-        logger.info("Connected to RabbitMQ")
+    if state.connection is None or state.connection.is_closed:
+        async with state.connection_lock:
+            if state.connection is None or state.connection.is_closed:
+                state.connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
+                logger.info("Connected to RabbitMQ")
         
-    return _connection
+    return state.connection
 
 
 async def get_rabbitmq_channel() -> aio_pika.Channel:
     """Get or create RabbitMQ channel."""
-    global _channel
-    
-    connection = await get_rabbitmq_connection()
+    state = _get_state()
     
-    if _channel is None or _channel.is_closed:
-        _channel = await connection.channel()
-        # Declare the transcode queue
-        await _channel.declare_queue(
-            VIDEO_TRANSCODE_QUEUE,
-            durable=True  # Survive broker restarts
-        )
-        logger.info(f"Declared queue: {VIDEO_TRANSCODE_QUEUE}")
+    if state.channel is None or state.channel.is_closed:
+        connection = await get_rabbitmq_connection()
+        async with state.channel_lock:
+            if state.channel is None or state.channel.is_closed:
+                state.channel = await connection.channel()
+                # Exchange handles are bound to the old channel
+                state.events_exchange = None
+                state.message_events_exchange = None
+                # Declare the transcode queue
+                await state.channel.declare_queue(
+                    VIDEO_TRANSCODE_QUEUE,
+                    durable=True  # Survive broker restarts
+                )
+                logger.info(f"Declared queue: {VIDEO_TRANSCODE_QUEUE}")
         
-    return _channel
+    return state.channel
 
 
 async def get_events_exchange() -> aio_pika.Exchange:
     """Get or create events exchange for notification events."""
-    global _events_exchange
+    state = _get_state()
     
-    if _events_exchange is None:
-        channel = await get_rabbitmq_channel()
-        _events_exchange = await channel.declare_exchange(
-            EVENTS_EXCHANGE,
-            ExchangeType.TOPIC,
-            durable=True
-        )
-        logger.info(f"Declared exchange: {EVENTS_EXCHANGE}")
+    channel = await get_rabbitmq_channel()
+    if state.events_exchange is None:
+        async with state.exchange_lock:
+            if state.events_exchange is None:
+                state.events_exchange = await channel.declare_exchange(
+                    EVENTS_EXCHANGE,
+                    ExchangeType.TOPIC,
+                    durable=True
+                )
+                logger.info(f"Declared exchange: {EVENTS_EXCHANGE}")
     
-    return _events_exchange
+    return state.events_exchange
 
 
 async def get_message_events_exchange() -> aio_pika.Exchange:
     """Get or create message events exchange for messaging system."""
-    global _message_events_exchange
+    state = _get_state()
     
-    if _message_events_exchange is None:
-        channel = await get_rabbitmq_channel()
-        _message_events_exchange = await channel.declare_exchange(
-            MESSAGE_EVENTS_EXCHANGE,
-            ExchangeType.TOPIC,
-            durable=True
-        )
-        logger.info(f"Declared exchange: {MESSAGE_EVENTS_EXCHANGE}")
+    channel = await get_rabbitmq_channel()
+    if state.message_events_exchange is None:
+        async with state.exchange_lock:
+            if state.message_events_exchange is None:
+                state.message_events_exchange = await channel.declare_exchange(
+                    MESSAGE_EVENTS_EXCHANGE,
+                    ExchangeType.TOPIC,
+                    durable=True
+                )
+                logger.info(f"Declared exchange: {MESSAGE_EVENTS_EXCHANGE}")
+    
+    return state.message_events_exchange
+
+
+async def get_transient_message_events_exchange() -> aio_pika.Exchange:
+    """Get message events exchange on a channel without publisher confirms."""
+    state = _get_state()
     
-    return _message_events_exchange
+    if state.transient_channel is None or state.transient_channel.is_closed:
+        connection = await get_rabbitmq_connection()
+        async with state.channel_lock:
+            if state.transient_channel is None or state.transient_channel.is_closed:
+                state.transient_channel = await connection.channel(publisher_confirms=False)
+                state.transient_message_events_exchange = (
+                    await state.transient_channel.declare_exchange(
+                        MESSAGE_EVENTS_EXCHANGE,
+                        ExchangeType.TOPIC,
+                        durable=True
+                    )
+                )
+    
+    return state.transient_message_events_exchange
+
+
+async def declare_exchanges() -> None:
+    """Open the publisher channels and declare every exchange up front."""
+    await get_events_exchange()
+    await get_message_events_exchange()
+    await get_transient_message_events_exchange()
 
 
 async def close_rabbitmq_connection() -> None:
     """Close RabbitMQ connection."""
-    global _connection, _channel, _events_exchange, _message_events_exchange
+    state = _states.pop(asyncio.get_running_loop(), None)
+    if state is None:
+        return
     
-    _events_exchange = None
-    _message_events_exchange = None
+    if state.channel and not state.channel.is_closed:
+        await state.channel.close()
     
-    if _channel and not _channel.is_closed:
-        await _channel.close()
-        _channel = None
+    if state.transient_channel and not state.transient_channel.is_closed:
+        await state.transient_channel.close()
         
-    if _connection and not _connection.is_closed:
-        await _connection.close()
-        _connection = None
+    if state.connection and not state.connection.is_closed:
+        await state.connection.close()
         logger.info("RabbitMQ connection closed")
 
 
@@ -139,14 +212,14 @@ async def publish_transcode_job(video_id: str, raw_key: str) -> bool:
     try:
         channel = await get_rabbitmq_channel()
         
-        message_body = json.dumps({
+        message_body = orjson.dumps({
             "video_id": video_id,
             "raw_key": raw_key,
-            "timestamp": str(import_datetime_now())
-        })
+            "timestamp": datetime.now(timezone.utc),
+        }, option=ORJSON_OPTIONS)
         
         message = Message(
-            body=message_body.encode(),
+            body=message_body,
             delivery_mode=DeliveryMode.PERSISTENT,  # Survive broker restarts
             content_type="application/json"
         )
@@ -156,7 +229,7 @@ async def publish_transcode_job(video_id: str, raw_key: str) -> bool:
             routing_key=VIDEO_TRANSCODE_QUEUE
         )
         
-        logger.info(f"Published transcode job for video: {video_id}")
+        logger.info("Published transcode job for video: %s", video_id)
         return True
         
     except Exception as e:
@@ -179,12 +252,12 @@ async def publish_event(routing_key: str, payload: dict[str, Any]) -> bool:
         exchange = await get_events_exchange()
         
         # Add timestamp to payload
-        payload["timestamp"] = str(import_datetime_now())
+        payload["timestamp"] = datetime.now(timezone.utc)
         
-        message_body = json.dumps(payload)
+        message_body = orjson.dumps(payload, default=str, option=ORJSON_OPTIONS)
         
         message = Message(
-            body=message_body.encode(),
+            body=message_body,
             delivery_mode=DeliveryMode.PERSISTENT,
             content_type="application/json"
         )
@@ -194,7 +267,7 @@ async def publish_event(routing_key: str, payload: dict[str, Any]) -> bool:
             routing_key=routing_key
         )
         
-        logger.info(f"Published event {routing_key}: {payload}")
+        logger.info("Published event %s", routing_key)
         return True
         
     except Exception as e:
@@ -202,10 +275,44 @@ async def publish_event(routing_key: str, payload: dict[str, Any]) -> bool:
         return False
 
 
-def import_datetime_now():
-    """Helper to get current datetime in UTC with timezone info."""
-    from datetime import datetime, timezone
-    return datetime.now(timezone.utc).isoformat()
+async def publish_event_batch(events: list[tuple[str, dict[str, Any]]]) -> bool:
+    """
+    Publish several notification events, waiting for their confirms together.
+    
+    All messages are written to the channel before any confirm is awaited,
+    so N events cost one broker round-trip instead of N.
+    
+    Args:
+        events: (routing_key, payload) pairs
+        
+    Returns:
+        True if every event was published successfully
+    """
+    if not events:
+        return True
+    
+    try:
+        exchange = await get_events_exchange()
+        timestamp = datetime.now(timezone.utc)
+        
+        publishes = []
+        for routing_key, payload in events:
+            payload["timestamp"] = timestamp
+            message = Message(
+                body=orjson.dumps(payload, default=str, option=ORJSON_OPTIONS),
+                delivery_mode=DeliveryMode.PERSISTENT,
+                content_type="application/json"
+            )
+            publishes.append(exchange.publish(message, routing_key=routing_key))
+        
+        await asyncio.gather(*publishes)
+        
+        logger.info("Published %s events", len(events))
+        return True
+        
+    except Exception as e:
+        logger.error(f"Failed to publish event batch: {e}")
+        return False
 
 
 async def publish_message_event(routing_key: str, payload: dict[str, Any]) -> bool:
@@ -220,16 +327,20 @@ async def publish_message_event(routing_key: str, payload: dict[str, Any]) -> bo
         True if published successfully
     """
     try:
-        exchange = await get_message_events_exchange()
+        transient = routing_key in TRANSIENT_MESSAGE_EVENTS
+        if transient:
+            exchange = await get_transient_message_events_exchange()
+        else:
+            exchange = await get_message_events_exchange()
         
         # Add timestamp to payload
-        payload["timestamp"] = str(import_datetime_now())
+        payload["timestamp"] = datetime.now(timezone.utc)
         
-        message_body = json.dumps(payload)
+        message_body = orjson.dumps(payload, default=str, option=ORJSON_OPTIONS)
         
         message = Message(
-            body=message_body.encode(),
-            delivery_mode=DeliveryMode.PERSISTENT,
+            body=message_body,
+            delivery_mode=DeliveryMode.NOT_PERSISTENT if transient else DeliveryMode.PERSISTENT,
             content_type="application/json"
         )
         
@@ -238,7 +349,7 @@ async def publish_message_event(routing_key: str, payload: dict[str, Any]) -> bo
             routing_key=routing_key
         )
         
-        logger.info(f"Published message event {routing_key}")
+        logger.info("Published message event %s", routing_key)
         return True
         
     except Exception as e:
@@ -1,53 +1,112 @@
 """Friend recommendation service using hybrid AI algorithm."""
 import logging
-import math
 from collections import defaultdict
-from typing import Optional
 
-from beanie.operators import And, Or
+import numpy as np
+from beanie import BulkWriter
+from beanie.operators import And, In, NotIn, Or
 
 from app.models import (
+    RANK_VALUES,
     Friendship,
     FriendshipStatus,
     PostLike,
-    RankEnum,
     User,
+    UserSuggestionProjection,
 )
+from app.services.redis_client import redis_service
 
 logger = logging.getLogger(__name__)
 
+# Same-rank users added to the friend-of-friend shortlist
+SAME_RANK_SAMPLE_SIZE = 200
 
-# Rank mapping for numerical comparison
-RANK_MAP = {
-    RankEnum.BRONZE: 1,
-    RankEnum.SILVER: 2,
-    RankEnum.GOLD: 3,
-    RankEnum.PLATINUM: 4,
-    RankEnum.DIAMOND: 5,
-    RankEnum.VETERAN: 6,
-    RankEnum.MASTER: 7,
-    RankEnum.CONQUEROR: 8,
-}
+# Precomputed 1 / log(count + 1) popularity weights (index 0 weighs 0)
+INVERSE_LOG_TABLE_SIZE = 4096
+_INVERSE_LOG_WEIGHTS = np.zeros(INVERSE_LOG_TABLE_SIZE)
+_INVERSE_LOG_WEIGHTS[1:] = 1.0 / np.log(np.arange(2, INVERSE_LOG_TABLE_SIZE + 1))
+
+# Precomputed rank scores by rank distance: Gaussian kernel e^(-(diff^2) / 2),
+# weighted to 20% of the total (max 2.0). Distances run up to the highest
+# rank value, reached against an unranked candidate (rank_value 0)
+_RANK_SCORES = np.exp(-(np.arange(max(RANK_VALUES.values()) + 1) ** 2) / 2) * 2.0
 
 
 async def get_friend_ids(user_id: str) -> set[str]:
     """Get all friend IDs for a user (accepted friendships)."""
+    friend_sets = await get_friend_sets_bulk([user_id])
+    return friend_sets[user_id]
+
+
+async def backfill_rank_values() -> int:
+    """
+    Populate rank_value on users saved before the field existed.
+    
+    One update per rank, sent together as a single bulk write; users
+    already carrying rank_value are skipped, so this is safe to run on
+    every startup.
+    """
+    bulk_writer = BulkWriter(ordered=False, object_class=User)
+    for rank, value in RANK_VALUES.items():
+        await User.find(
+            {"rank": rank.value, "rank_value": {"$exists": False}}
+        ).update_many({"$set": {"rank_value": value}}, bulk_writer=bulk_writer)
+    result = await bulk_writer.commit()
+    updated = result.modified_count if result else 0
+    
+    if updated:
+        logger.info(f"Backfilled rank_value for {updated} users")
+    return updated
+
+
+async def get_friend_sets_bulk(user_ids: list[str]) -> dict[str, set[str]]:
+    """
+    Get friend IDs for many users.
+    
+    Reads the Redis friend-set cache first; users not cached are loaded
+    with a single Friendship query and written back to the cache.
+    """
+    friend_sets: dict[str, set[str]] = {}
+    if not user_ids:
+        return friend_sets
+    
+    missing_ids = user_ids
+    try:
+        cached = await redis_service.get_friend_sets(user_ids)
+        missing_ids = []
+        for uid, friend_ids in zip(user_ids, cached, strict=True):
+            if friend_ids is None:
+                missing_ids.append(uid)
+            else:
+                friend_sets[uid] = friend_ids
+    except Exception as e:
+        logger.warning(f"Failed to read cached friend sets: {e}")
+    
+    if not missing_ids:
+        return friend_sets
+    
+    loaded: dict[str, set[str]] = {uid: set() for uid in missing_ids}
     friendships = await Friendship.find(
         Friendship.status == FriendshipStatus.ACCEPTED,
         Or(
-            Friendship.requester_id == user_id,
-            Friendship.addressee_id == user_id,
+            In(Friendship.requester_id, missing_ids),
+            In(Friendship.addressee_id, missing_ids),
         ),
     ).to_list()
     
-    friend_ids = set()
     for f in friendships:
-        if f.requester_id == user_id:
-            friend_ids.add(f.addressee_id)
-        else:
-            friend_ids.add(f.requester_id)
-    
-    return friend_ids
+        if f.requester_id in loaded:
+            loaded[f.requester_id].add(f.addressee_id)
+        if f.addressee_id in loaded:
+            loaded[f.addressee_id].add(f.requester_id)
+    
+    try:
+        await redis_service.set_friend_sets(loaded)
+    except Exception as e:
+        logger.warning(f"Failed to cache friend sets: {e}")
+    
+    friend_sets.update(loaded)
+    return friend_sets
 
 
 async def get_pending_request_ids(user_id: str) -> set[str]:
@@ -70,144 +129,177 @@ async def get_pending_request_ids(user_id: str) -> set[str]:
     return pending_ids
 
 
-async def get_mutual_friends(user_id: str, candidate_id: str) -> set[str]:
-    """Get mutual friends between two users."""
-    user_friends = await get_friend_ids(user_id)
-    candidate_friends = await get_friend_ids(candidate_id)
-    return user_friends & candidate_friends
-
-
-async def calculate_friend_similarity(user_id: str, candidate_id: str) -> float:
+async def get_excluded_ids(user_id: str, friend_ids: set[str]) -> set[str]:
     """
-    Calculate friend similarity using Adamic-Adar Index.
-    
-    This algorithm weights mutual friends by the inverse log of their total friend count.
-    Friends with fewer friends are weighted more heavily (more unique connection).
+    Get IDs never suggested to a user: friends, pending requests and self.
     
-    Returns: Score between 0-10 (weighted for 45% of total score)
+    Cached in Redis and dropped whenever one of the user's friendships changes.
     """
-    mutual_friends = await get_mutual_friends(user_id, candidate_id)
-    
-    if not mutual_friends:
-        return 0.0
+    try:
+        cached = await redis_service.get_suggestion_exclusions(user_id)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        logger.warning(f"Failed to read cached exclusions for {user_id}: {e}")
     
-    score = 0.0
-    for friend_id in mutual_friends:
-        friend_count = len(await get_friend_ids(friend_id))
-        if friend_count > 0:
-            # Adamic-Adar: 1 / log(friend_count)
-            score += 1.0 / math.log(friend_count + 1)
+    pending_ids = await get_pending_request_ids(user_id)
+    excluded_ids = friend_ids | pending_ids | {user_id}
     
-    # Weight: 45% of total (max 4.5)
-    return min(score * 4.5, 4.5)
+    try:
+        await redis_service.set_suggestion_exclusions(user_id, excluded_ids)
+    except Exception as e:
+        logger.warning(f"Failed to cache exclusions for {user_id}: {e}")
+    return excluded_ids
 
 
-async def calculate_content_similarity(user_id: str, candidate_id: str) -> float:
-    """
-    Calculate content similarity based on post likes using Cosine Similarity.
-    
-    For sparse data (few likes), uses weighted overlap where rare posts
-    (fewer likes) are weighted more heavily.
-    
-    Returns: Score between 0-10 (weighted for 35% of total score)
-    """
-    # Get all post likes for both users
-    user_likes = await PostLike.find(PostLike.user_id == user_id).to_list()
-    candidate_likes = await PostLike.find(PostLike.user_id == candidate_id).to_list()
-    
-    if not user_likes or not candidate_likes:
-        return 0.0
-    
-    user_post_ids = {like.post_id for like in user_likes}
-    candidate_post_ids = {like.post_id for like in candidate_likes}
-    
-    # Common posts
-    common_posts = user_post_ids & candidate_post_ids
-    
-    if not common_posts:
-        return 0.0
-    
-    # Weighted overlap: weight by rarity of the post
-    # (posts with fewer likes are more unique/valuable matches)
-    score = 0.0
-    for post_id in common_posts:
-        # Count total likes for this post
-        total_likes = await PostLike.find(PostLike.post_id == post_id).count()
-        if total_likes > 0:
-            # Weight by inverse log of popularity
-            score += 1.0 / math.log(total_likes + 1)
-    
-    # Normalize by Jaccard similarity for balance
-    union_size = len(user_post_ids | candidate_post_ids)
-    jaccard = len(common_posts) / union_size if union_size > 0 else 0
-    
-    # Combine weighted score with Jaccard
-    final_score = (score + jaccard * 5) / 2
-    
-    # Weight: 35% of total (max 3.5)
-    return min(final_score * 3.5, 3.5)
+async def get_mutual_friends(user_id: str, candidate_id: str) -> set[str]:
+    """Get mutual friends between two users."""
+    friend_sets = await get_friend_sets_bulk([user_id, candidate_id])
+    return friend_sets[user_id] & friend_sets[candidate_id]
 
 
-def calculate_rank_similarity(user_rank: Optional[RankEnum], candidate_rank: Optional[RankEnum]) -> float:
-    """
-    Calculate rank similarity using Gaussian kernel.
-    
-    Users with closer ranks get higher scores.
-    Uses Gaussian (bell curve) so same rank = max score,
-    and score decreases with distance.
-    
-    Returns: Score between 0-10 (weighted for 20% of total score)
-    """
-    if user_rank is None or candidate_rank is None:
-        return 0.0
-    
-    user_val = RANK_MAP.get(user_rank, 0)
-    candidate_val = RANK_MAP.get(candidate_rank, 0)
-    
-    diff = abs(user_val - candidate_val)
+async def get_post_like_counts(post_ids: list[str]) -> dict[str, int]:
+    """Count total likes for many posts with a single aggregation."""
+    if not post_ids:
+        return {}
+    
+    pipeline = [
+        {"$match": {"post_id": {"$in": post_ids}}},
+        {"$group": {"_id": "$post_id", "count": {"$sum": 1}}},
+    ]
+    results = await PostLike.aggregate(pipeline).to_list()
+    return {r["_id"]: r["count"] for r in results}
+
+
+async def get_user_like_counts(user_ids: list[str]) -> dict[str, int]:
+    """Count posts liked by many users with a single aggregation."""
+    if not user_ids:
+        return {}
+    
+    pipeline = [
+        {"$match": {"user_id": {"$in": user_ids}}},
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+    ]
+    results = await PostLike.aggregate(pipeline).to_list()
+    return {r["_id"]: r["count"] for r in results}
+
+
+async def get_likers_by_post_ids(post_ids: list[str]) -> dict[str, set[str]]:
+    """Map each user who liked any of the given posts to the posts they liked."""
+    liked_posts: dict[str, set[str]] = defaultdict(set)
+    if not post_ids:
+        return liked_posts
     
-    # Gaussian kernel: e^(-(diff^2) / 2)
-    # Same rank (diff=0) = 1.0, ±1 rank ≈ 0.6, ±2 ranks ≈ 0.14
-    similarity = math.exp(-(diff ** 2) / 2)
+    likes = await PostLike.find(In(PostLike.post_id, post_ids)).to_list()
+    for like in likes:
+        liked_posts[like.user_id].add(like.post_id)
     
-    # Weight: 20% of total (max 2.0)
-    return similarity * 2.0
+    return liked_posts
+
+
+def _inverse_log_weights(counts: np.ndarray) -> np.ndarray:
+    """Weight items by inverse log of their popularity; zero counts weigh 0."""
+    weights = _INVERSE_LOG_WEIGHTS[np.minimum(counts, INVERSE_LOG_TABLE_SIZE - 1)]
+    # Counts past the table are rare enough to compute directly
+    large = counts >= INVERSE_LOG_TABLE_SIZE
+    if large.any():
+        weights[large] = 1.0 / np.log(counts[large] + 1)
+    return weights
 
 
-async def calculate_friend_score(user: User, candidate: User) -> tuple[float, int]:
+def score_candidates(
+    user: User,
+    candidates: list[UserSuggestionProjection],
+    mutual_friends_by_user: dict[str, set[str]],
+    friend_counts: dict[str, int],
+    user_post_ids: set[str],
+    common_posts_by_user: dict[str, set[str]],
+    candidate_like_counts: dict[str, int],
+    post_like_counts: dict[str, int],
+) -> tuple[np.ndarray, np.ndarray]:
     """
-    Calculate overall friend suggestion score using hybrid algorithm.
+    Score all candidates at once using hybrid algorithm.
     
     Combines:
     - Collaborative Filtering (45%): Mutual friends via Adamic-Adar
     - Content-Based Filtering (35%): Post likes similarity
     - Rank Proximity (20%): Similar game ranks
     
-    Returns: (total_score, mutual_friends_count)
+    Mutual friends and common liked posts are flattened into
+    (candidate index, item index) pairs, so every per-candidate sum is a
+    single np.bincount instead of a Python loop per candidate.
+    
+    Returns: (total_scores, mutual_friends_counts), aligned with candidates
     """
-    # 1. Friend Similarity (45%)
-    friend_score = await calculate_friend_similarity(user.id, candidate.id)
+    n = len(candidates)
+    
+    # 1. Friend Similarity (45%): Adamic-Adar Index
+    # Mutual friends are weighted by the inverse log of their total friend
+    # count, so friends with fewer friends (more unique connection) count more
+    friend_index = {fid: i for i, fid in enumerate(friend_counts)}
+    friend_weights = _inverse_log_weights(
+        np.array([friend_counts.get(fid, 0) for fid in friend_index], dtype=np.intp)
+    )
+    pair_candidates: list[int] = []
+    pair_friends: list[int] = []
+    for i, candidate in enumerate(candidates):
+        for fid in mutual_friends_by_user.get(candidate.id, ()):
+            pair_candidates.append(i)
+            pair_friends.append(friend_index[fid])
+    pair_candidates_arr = np.array(pair_candidates, dtype=np.intp)
+    
+    mutual_counts = np.bincount(pair_candidates_arr, minlength=n)
+    adamic_adar = np.bincount(
+        pair_candidates_arr,
+        weights=friend_weights[np.array(pair_friends, dtype=np.intp)],
+        minlength=n,
+    )
+    friend_scores = np.minimum(adamic_adar * 4.5, 4.5)
     
     # 2. Content Similarity (35%)
-    content_score = await calculate_content_similarity(user.id, candidate.id)
+    # Weighted overlap where rare posts (fewer likes) are more valuable
+    # matches, balanced with Jaccard similarity of the liked-post sets
+    post_index = {pid: i for i, pid in enumerate(user_post_ids)}
+    post_weights = _inverse_log_weights(
+        np.array([post_like_counts.get(pid, 0) for pid in post_index], dtype=np.intp)
+    )
+    pair_candidates = []
+    pair_posts: list[int] = []
+    for i, candidate in enumerate(candidates):
+        for pid in common_posts_by_user.get(candidate.id, ()):
+            pair_candidates.append(i)
+            pair_posts.append(post_index[pid])
+    pair_candidates_arr = np.array(pair_candidates, dtype=np.intp)
+    
+    common_counts = np.bincount(pair_candidates_arr, minlength=n)
+    overlap = np.bincount(
+        pair_candidates_arr,
+        weights=post_weights[np.array(pair_posts, dtype=np.intp)],
+        minlength=n,
+    )
+    like_counts = np.array(
+        [candidate_like_counts.get(c.id, 0) for c in candidates], dtype=np.float64
+    )
+    union_sizes = len(user_post_ids) + like_counts - common_counts
+    jaccard = np.divide(
+        common_counts, union_sizes, out=np.zeros(n), where=union_sizes > 0
+    )
+    content_scores = np.minimum((overlap + jaccard * 5) / 2 * 3.5, 3.5)
     
-    # 3. Rank Similarity (20%)
-    rank_score = calculate_rank_similarity(user.rank, candidate.rank)
+    # 3. Rank Similarity (20%): Gaussian kernel e^(-(diff^2) / 2)
+    # Same rank (diff=0) = 1.0, ±1 rank ≈ 0.6, ±2 ranks ≈ 0.14
+    # Users without a rank (rank_value 0) score 0
+    if not user.rank_value:
+        rank_scores = np.zeros(n)
+    else:
+        candidate_ranks = np.array([c.rank_value for c in candidates], dtype=np.int8)
+        rank_diffs = np.abs(candidate_ranks - user.rank_value)
+        rank_scores = np.where(candidate_ranks > 0, _RANK_SCORES[rank_diffs], 0.0)
     
     # Total score (max 10)
-    total_score = friend_score + content_score + rank_score
-    
-    # Get mutual friends count for display
-    mutual_friends = await get_mutual_friends(user.id, candidate.id)
-    mutual_count = len(mutual_friends)
+    total_scores = np.minimum(friend_scores + content_scores + rank_scores, 10.0)
     
-    logger.debug(
-        f"Score for {candidate.username}: "
-        f"friend={friend_score:.2f}, content={content_score:.2f}, "
-        f"rank={rank_score:.2f}, total={total_score:.2f}"
-    )
-    
-    return min(total_score, 10.0), mutual_count
+    return total_scores, mutual_counts
 
 
 async def get_friend_suggestions(user_id: str, limit: int = 10) -> list[dict]:
@@ -230,44 +322,95 @@ async def get_friend_suggestions(user_id: str, limit: int = 10) -> list[dict]:
     
     # Get users to exclude
     friend_ids = await get_friend_ids(user_id)
-    pending_ids = await get_pending_request_ids(user_id)
-    excluded_ids = friend_ids | pending_ids | {user_id}
-    
-    # Get all potential candidates (users not in excluded list)
+    excluded_ids = await get_excluded_ids(user_id, friend_ids)
+    
+    # Friend graph: each friend's own friends give the friends-of-friends,
+    # the mutual friends behind each of them, and the friend counts used to
+    # weight those mutual friends
+    friends_of_friends = await get_friend_sets_bulk(list(friend_ids))
+    friend_counts = {fid: len(fof) for fid, fof in friends_of_friends.items()}
+    mutual_friends_by_user: dict[str, set[str]] = defaultdict(set)
+    for fid, fof in friends_of_friends.items():
+        for other_id in fof:
+            if other_id not in excluded_ids:
+                mutual_friends_by_user[other_id].add(fid)
+    
+    # Likes: the user's liked posts, their popularity, and who else liked them
+    user_likes = await PostLike.find(PostLike.user_id == user_id).to_list()
+    user_post_ids = {like.post_id for like in user_likes}
+    post_like_counts = await get_post_like_counts(list(user_post_ids))
+    common_posts_by_user = await get_likers_by_post_ids(list(user_post_ids))
+    for excluded_id in excluded_ids:
+        common_posts_by_user.pop(excluded_id, None)
+    
+    # Shortlist instead of scanning every user: only friends-of-friends and
+    # co-likers can score on the friend and content signals, and a sample of
+    # same-rank users covers the best rank-only matches.
     # Only include verified users with profiles for better recommendations
-    all_users = await User.find(
-        User.profile_verified == True  # noqa: E712
-    ).to_list()
-    
-    candidates = [u for u in all_users if u.id not in excluded_ids]
+    candidates: list[UserSuggestionProjection] = []
+    if user.rank is not None:
+        candidates = await User.find(
+            User.rank == user.rank,
+            User.profile_verified == True,  # noqa: E712
+            NotIn(User.id, list(excluded_ids)),
+        ).limit(SAME_RANK_SAMPLE_SIZE).project(UserSuggestionProjection).to_list()
+    
+    sampled_ids = {c.id for c in candidates}
+    graph_ids = (set(mutual_friends_by_user) | set(common_posts_by_user)) - sampled_ids
+    if graph_ids:
+        candidates += await User.find(
+            In(User.id, list(graph_ids)),
+            User.profile_verified == True,  # noqa: E712
+        ).project(UserSuggestionProjection).to_list()
     
     if not candidates:
         logger.info(f"No candidates found for user {user_id}")
         return []
     
+    # Candidates only need a total like count for the Jaccard union, not
+    # their full like lists
+    candidate_like_counts = await get_user_like_counts(
+        [c.id for c in candidates if c.id in common_posts_by_user]
+    )
+    
     # Calculate scores for all candidates
-    scored_candidates = []
-    for candidate in candidates:
-        score, mutual_count = await calculate_friend_score(user, candidate)
-        
-        # Only include if score > 0 (has some connection)
-        if score > 0:
-            scored_candidates.append({
-                "id": candidate.id,
-                "username": candidate.username,
-                "avatar_url": candidate.avatar_url,
-                "rank": candidate.rank,
-                "level": candidate.level,
-                "mutual_friends_count": mutual_count,
-                "suggestion_score": round(score, 2),
-            })
-    
-    # Sort by score descending
-    scored_candidates.sort(key=lambda x: x["suggestion_score"], reverse=True)
+    scores, mutual_counts = score_candidates(
+        user,
+        candidates,
+        mutual_friends_by_user,
+        friend_counts,
+        user_post_ids,
+        common_posts_by_user,
+        candidate_like_counts,
+        post_like_counts,
+    )
+    
+    # Only include if score > 0 (has some connection)
+    positive = np.flatnonzero(scores > 0)
+    
+    # Select the top `limit` without sorting every candidate, then order them
+    # by score descending
+    top = positive
+    if len(positive) > limit:
+        top = positive[np.argpartition(-scores[positive], limit - 1)[:limit]]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    
+    suggestions = []
+    for i in top:
+        candidate = candidates[i]
+        suggestions.append({
+            "id": candidate.id,
+            "username": candidate.username,
+            "avatar_url": candidate.avatar_url,
+            "rank": candidate.rank,
+            "level": candidate.level,
+            "mutual_friends_count": int(mutual_counts[i]),
+            "suggestion_score": round(float(scores[i]), 2),
+        })
     
     logger.info(
-        f"Generated {len(scored_candidates)} suggestions for user {user_id}, "
+        f"Generated {len(positive)} suggestions for user {user_id}, "
         f"returning top {limit}"
     )
     
-    return scored_candidates[:limit]
+    return suggestions
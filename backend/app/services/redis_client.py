@@ -7,38 +7,117 @@ Provides async Redis client for:
 """
 
 import asyncio
-import json
+import functools
 import logging
+import random
 from typing import Any, Callable, Optional
 
+import orjson
 import redis.asyncio as redis
 from redis.asyncio.client import PubSub
+from redis.commands.core import AsyncScript
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Max notifications buffered per local subscriber; a subscriber that falls
+# this far behind has further notifications dropped until it catches up
+USER_CALLBACK_QUEUE_SIZE = 256
+
+# Fire-and-forget publishes are buffered and sent as one pipeline once the
+# batch is full or the window since the first buffered publish has elapsed
+PUBLISH_BATCH_SIZE = 100
+PUBLISH_BATCH_WINDOW_SECONDS = 0.005
+
+# Max PUBLISH commands per pipeline in publish_many, so one huge fan-out
+# does not hold a pooled connection for too long
+PUBLISH_MANY_CHUNK_SIZE = 1000
+
+# The pattern listener only reads from the socket; decoding and callbacks run
+# on worker tasks fed through a bounded queue, which applies back-pressure
+NOTIFICATION_LISTENER_WORKERS = 8
+NOTIFICATION_LISTENER_QUEUE_SIZE = 10_000
+
+# Max cached per-user key and channel names, enough for every active user
+KEY_NAME_CACHE_SIZE = 100_000
+
+
+@functools.lru_cache(maxsize=KEY_NAME_CACHE_SIZE)
+def _sockets_key(user_id: str) -> str:
+    """Name of the user's active sockets set."""
+    return f"user:{user_id}:sockets"
+
+
+@functools.lru_cache(maxsize=KEY_NAME_CACHE_SIZE)
+def _user_channel(channel_type: str, user_id: str) -> str:
+    """Name of the user's Pub/Sub channel of the given type."""
+    return f"{channel_type}:user:{user_id}"
+
+
+# Remove a socket and drop the set once empty, atomically in one round-trip
+REMOVE_SOCKET_SCRIPT = """
+local removed = redis.call('SREM', KEYS[1], ARGV[1])
+if redis.call('SCARD', KEYS[1]) == 0 then
+    redis.call('DEL', KEYS[1])
+end
+return removed
+"""
+
 
 class RedisService:
     """Redis service for notification routing and online state management."""
     
     def __init__(self):
         self._client: Optional[redis.Redis] = None
+        # Separate pool for long-lived PubSub connections, so subscribers
+        # never take connections away from command traffic
+        self._pubsub_client: Optional[redis.Redis] = None
+        self._remove_socket_script: Optional[AsyncScript] = None
         self._pubsub: Optional[PubSub] = None
         self._listener_task: Optional[asyncio.Task] = None
+        # Local notification subscribers: user_id -> {callback: (queue, drain task)}
+        self._notification_subscribers: dict[
+            str,
+            dict[
+                Callable[[dict[str, Any]], Any],
+                tuple[asyncio.Queue[dict[str, Any]], asyncio.Task]
+            ]
+        ] = {}
+        self._dispatcher_lock = asyncio.Lock()
+        self._publish_queue: asyncio.Queue[tuple[str, bytes]] = asyncio.Queue()
+        self._publisher_task: Optional[asyncio.Task] = None
     
     async def connect(self) -> None:
         """Connect to Redis server."""
         if self._client is None:
-            self._client = redis.from_url(
+            # Blocking pool: under a burst, commands wait up to
+            # REDIS_POOL_TIMEOUT for a free connection instead of failing
+            # with "Too many connections"
+            pool = redis.BlockingConnectionPool.from_url(
                 settings.REDIS_URL,
                 encoding="utf-8",
                 decode_responses=True,
                 socket_connect_timeout=10.0,  # 10 second timeout for initial connection
+                health_check_interval=30,  # Send PING every 30 seconds to keep connection alive
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                timeout=settings.REDIS_POOL_TIMEOUT,
+            )
+            self._client = redis.Redis.from_pool(pool)
+            # Raw bytes: payloads go straight to orjson or the websocket
+            # without a UTF-8 decode in redis-py first. Connections are held
+            # per WebSocket, so this pool fails fast once full rather than
+            # queueing new sockets behind long-lived ones
+            self._pubsub_client = redis.from_url(
+                settings.REDIS_URL,
+                decode_responses=False,
+                socket_connect_timeout=10.0,
                 # Note: socket_timeout intentionally not set for PubSub compatibility
                 # PubSub needs to wait indefinitely for messages
-                health_check_interval=30,  # Send PING every 30 seconds to keep connection alive
+                health_check_interval=30,
+                max_connections=settings.REDIS_PUBSUB_MAX_CONNECTIONS,
             )
+            self._remove_socket_script = self._client.register_script(REMOVE_SOCKET_SCRIPT)
             # Test connection
             await self._client.ping()
             logger.info("Connected to Redis")
@@ -54,12 +133,30 @@ class RedisService:
                 pass
             self._listener_task = None
         
+        # Stop the batched publisher; anything still queued is dropped
+        if self._publisher_task and not self._publisher_task.done():
+            self._publisher_task.cancel()
+            try:
+                await self._publisher_task
+            except asyncio.CancelledError:
+                pass
+        self._publisher_task = None
+        
+        for subscribers in self._notification_subscribers.values():
+            for _, task in subscribers.values():
+                task.cancel()
+        self._notification_subscribers.clear()
+        
         # Close pubsub
         if self._pubsub:
             await self._pubsub.close()
             self._pubsub = None
         
-        # Close client
+        # Close clients
+        if self._pubsub_client:
+            await self._pubsub_client.close()
+            self._pubsub_client = None
+        
         if self._client:
             await self._client.close()
             self._client = None
@@ -72,36 +169,228 @@ class RedisService:
             raise RuntimeError("Redis not connected. Call connect() first.")
         return self._client
     
+    def pubsub(self) -> PubSub:
+        """
+        Create a PubSub object on the dedicated subscriber pool.
+        
+        Message channels and data are bytes; the message type is still str.
+        """
+        if self._pubsub_client is None:
+            raise RuntimeError("Redis not connected. Call connect() first.")
+        return self._pubsub_client.pubsub()
+    
     # ==================== Online State Management ====================
     
     async def add_socket(self, user_id: str, socket_id: str) -> None:
         """Add socket ID to user's active connections set."""
-        key = f"user:{user_id}:sockets"
-        await self.client.sadd(key, socket_id)
+        key = _sockets_key(user_id)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.sadd(key, socket_id)
         # Set TTL of 24 hours as safety net
-        await self.client.expire(key, 86400)
-        logger.debug(f"Added socket {socket_id} for user {user_id}")
+        pipe.expire(key, 86400)
+        await pipe.execute()
+        logger.debug("Added socket %s for user %s", socket_id, user_id)
     
     async def remove_socket(self, user_id: str, socket_id: str) -> None:
         """Remove socket ID from user's active connections set."""
-        key = f"user:{user_id}:sockets"
-        await self.client.srem(key, socket_id)
+        key = _sockets_key(user_id)
         # Clean up key if no more sockets
-        count = await self.client.scard(key)
-        if count == 0:
-            await self.client.delete(key)
-        logger.debug(f"Removed socket {socket_id} for user {user_id}")
+        await self._remove_socket_script(keys=[key], args=[socket_id])
+        logger.debug("Removed socket %s for user %s", socket_id, user_id)
     
     async def get_user_sockets(self, user_id: str) -> set[str]:
         """Get all active socket IDs for a user."""
-        key = f"user:{user_id}:sockets"
+        key = _sockets_key(user_id)
         return await self.client.smembers(key)
     
     async def is_user_online(self, user_id: str) -> bool:
         """Check if user has any active connections."""
-        key = f"user:{user_id}:sockets"
-        count = await self.client.scard(key)
-        return count > 0
+        # A socket on this process is subscribed locally; no round-trip needed
+        if user_id in self._notification_subscribers:
+            return True
+        # Empty socket sets are deleted, so the key exists only while online
+        key = _sockets_key(user_id)
+        return await self.client.exists(key) > 0
+    
+    async def are_users_online(self, user_ids: list[str]) -> list[bool]:
+        """Check online status for many users in a single round-trip."""
+        flags = [user_id in self._notification_subscribers for user_id in user_ids]
+        unknown = [i for i, online in enumerate(flags) if not online]
+        if not unknown:
+            return flags
+        pipe = self.client.pipeline(transaction=False)
+        for i in unknown:
+            pipe.exists(_sockets_key(user_ids[i]))
+        counts = await pipe.execute()
+        for i, count in zip(unknown, counts, strict=True):
+            flags[i] = count > 0
+        return flags
+    
+    # ==================== User Profile Cache ====================
+    
+    async def get_user_profile(self, user_id: str) -> Optional[dict[str, Any]]:
+        """Get cached profile fields (username, avatar_url) for a user."""
+        key = f"user:{user_id}:profile"
+        cached = await self.client.get(key)
+        if cached is None:
+            return None
+        return orjson.loads(cached)
+    
+    async def set_user_profile(
+        self,
+        user_id: str,
+        profile: dict[str, Any],
+        ex: int = 300
+    ) -> None:
+        """Cache profile fields for a user with a TTL (default 5 minutes)."""
+        key = f"user:{user_id}:profile"
+        await self.client.set(key, orjson.dumps(profile), ex=ex)
+    
+    async def invalidate_user_profile(self, user_id: str) -> None:
+        """Drop cached profile fields after the user updates their profile."""
+        key = f"user:{user_id}:profile"
+        await self.client.delete(key)
+    
+    # ==================== Conversation Membership Cache ====================
+    
+    async def is_conversation_member(
+        self,
+        conversation_id: str,
+        user_id: str
+    ) -> Optional[bool]:
+        """
+        Check cached membership of a conversation.
+        
+        Returns None when the member set is not cached, so the caller can
+        fall back to the database and repopulate it.
+        """
+        key = f"conv:{conversation_id}:members"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.exists(key)
+        pipe.sismember(key, user_id)
+        exists, is_member = await pipe.execute()
+        if not exists:
+            return None
+        return bool(is_member)
+    
+    async def set_conversation_members(
+        self,
+        conversation_id: str,
+        user_ids: list[str],
+        ex: int = 3600
+    ) -> None:
+        """Cache the full set of active members of a conversation."""
+        if not user_ids:
+            return
+        key = f"conv:{conversation_id}:members"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.sadd(key, *user_ids)
+        pipe.expire(key, ex)
+        await pipe.execute()
+    
+    async def invalidate_conversation_members(self, conversation_id: str) -> None:
+        """Drop the cached member set after participants change."""
+        key = f"conv:{conversation_id}:members"
+        await self.client.delete(key)
+    
+    # ==================== Friend Set Cache ====================
+    
+    async def get_friend_sets(self, user_ids: list[str]) -> list[Optional[set[str]]]:
+        """
+        Get cached friend IDs for many users in one round-trip.
+        
+        Entries are None for users whose friend set is not cached.
+        """
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            key = f"user:{user_id}:friends"
+            pipe.exists(key)
+            pipe.smembers(key)
+        results = await pipe.execute()
+        return [
+            members if exists else None
+            for exists, members in zip(results[::2], results[1::2], strict=True)
+        ]
+    
+    async def set_friend_sets(
+        self,
+        friend_sets: dict[str, set[str]],
+        ex: int = 3600
+    ) -> None:
+        """Cache friend IDs for many users with a TTL (default 1 hour)."""
+        pipe = self.client.pipeline(transaction=True)
+        for user_id, friend_ids in friend_sets.items():
+            # Empty sets cannot be stored; those users fall back to the DB
+            if not friend_ids:
+                continue
+            key = f"user:{user_id}:friends"
+            pipe.delete(key)
+            pipe.sadd(key, *friend_ids)
+            pipe.expire(key, ex)
+        await pipe.execute()
+    
+    async def get_suggestion_exclusions(self, user_id: str) -> Optional[set[str]]:
+        """
+        Get the cached IDs excluded from a user's friend suggestions.
+        
+        The set always contains the user, so an empty result means not cached.
+        """
+        members = await self.client.smembers(f"user:{user_id}:excluded")
+        return members or None
+    
+    async def set_suggestion_exclusions(
+        self,
+        user_id: str,
+        excluded_ids: set[str],
+        ex: int = 3600
+    ) -> None:
+        """Cache friends, pending requests and the user itself (default 1 hour)."""
+        key = f"user:{user_id}:excluded"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(key)
+        pipe.sadd(key, *excluded_ids)
+        pipe.expire(key, ex)
+        await pipe.execute()
+    
+    async def invalidate_friend_graph(self, *user_ids: str) -> None:
+        """Drop cached friend sets and suggestion exclusions after a friendship changes."""
+        keys = []
+        for user_id in user_ids:
+            keys.append(f"user:{user_id}:friends")
+            keys.append(f"user:{user_id}:excluded")
+        await self.client.delete(*keys)
+    
+    # ==================== Notification Coalescing ====================
+    
+    async def claim_notification_slot(
+        self,
+        slot: str,
+        notification_id: str,
+        ex: int = 60
+    ) -> Optional[str]:
+        """
+        Claim a coalescing window for a notification.
+        
+        Returns None if this notification now owns the window, otherwise the
+        ID of the notification that already owns it.
+        """
+        key = f"notif:coalesce:{slot}"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.set(key, notification_id, nx=True, ex=ex)
+        pipe.get(key)
+        claimed, owner = await pipe.execute()
+        return None if claimed else owner
+    
+    async def set_notification_slot(
+        self,
+        slot: str,
+        notification_id: str,
+        ex: int = 60
+    ) -> None:
+        """Hand a coalescing window over to a new notification."""
+        key = f"notif:coalesce:{slot}"
+        await self.client.set(key, notification_id, ex=ex)
     
     # ==================== Pub/Sub for Notifications ====================
     
@@ -116,12 +405,48 @@ class RedisService:
         Returns:
             Number of subscribers that received the message
         """
-        channel = f"notification:user:{user_id}"
-        message = json.dumps(payload)
+        channel = _user_channel("notification", user_id)
+        message = orjson.dumps(payload)
         count = await self.client.publish(channel, message)
-        logger.debug(f"Published notification to {channel}, {count} receivers")
+        logger.debug("Published notification to %s, %s receivers", channel, count)
         return count
     
+    def publish_notification_nowait(self, user_id: str, payload: dict[str, Any]) -> None:
+        """
+        Queue a notification for the user's channel without waiting for Redis.
+        
+        Use when the subscriber count is not needed: queued publishes are
+        sent together in one pipeline by a background task.
+        """
+        channel = _user_channel("notification", user_id)
+        self._publish_queue.put_nowait((channel, orjson.dumps(payload)))
+        if self._publisher_task is None or self._publisher_task.done():
+            self._publisher_task = asyncio.create_task(self._publish_loop())
+    
+    async def _publish_loop(self) -> None:
+        """Drain queued publishes into pipelined batches."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._publish_queue.get()]
+            deadline = loop.time() + PUBLISH_BATCH_WINDOW_SECONDS
+            while len(batch) < PUBLISH_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._publish_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                pipe = self.client.pipeline(transaction=False)
+                for channel, data in batch:
+                    pipe.publish(channel, data)
+                await pipe.execute()
+                logger.debug("Published %s queued messages", len(batch))
+            except Exception as e:
+                logger.error(f"Failed to publish {len(batch)} queued messages: {e}")
+    
     async def publish_to_user(
         self, 
         user_id: str, 
@@ -139,135 +464,240 @@ class RedisService:
         Returns:
             Number of subscribers that received the message
         """
-        channel = f"{channel_type}:user:{user_id}"
-        message = json.dumps(payload)
-        count = await self.client.publish(channel, message)
-        logger.debug(f"Published to {channel}, {count} receivers")
+        return await self.publish_raw(user_id, channel_type, orjson.dumps(payload))
+    
+    async def publish_many(
+        self,
+        user_ids: list[str],
+        payload: dict[str, Any],
+        channel_type: str = "notification"
+    ) -> int:
+        """
+        Publish the same payload to many users' channels.
+        
+        The payload is serialized once and the PUBLISH commands are sent in
+        pipelines of up to PUBLISH_MANY_CHUNK_SIZE, one round-trip each.
+        
+        Args:
+            user_ids: Target user IDs
+            payload: Data to send
+            channel_type: Channel type ("notification" or "message")
+            
+        Returns:
+            Total number of subscribers that received the message
+        """
+        data = orjson.dumps(payload)
+        total = 0
+        for start in range(0, len(user_ids), PUBLISH_MANY_CHUNK_SIZE):
+            pipe = self.client.pipeline(transaction=False)
+            for user_id in user_ids[start:start + PUBLISH_MANY_CHUNK_SIZE]:
+                pipe.publish(_user_channel(channel_type, user_id), data)
+            total += sum(await pipe.execute())
+        logger.debug("Published to %s %s channels, %s receivers", len(user_ids), channel_type, total)
+        return total
+    
+    async def publish_raw(
+        self,
+        user_id: str,
+        channel_type: str,
+        data: bytes
+    ) -> int:
+        """
+        Publish pre-serialized JSON bytes to a user's specific channel.
+        
+        Use this when fanning out the same payload to many users so it is
+        only serialized once.
+        
+        Args:
+            user_id: Target user ID
+            channel_type: Channel type ("notification" or "message")
+            data: JSON-encoded payload
+            
+        Returns:
+            Number of subscribers that received the message
+        """
+        channel = _user_channel(channel_type, user_id)
+        count = await self.client.publish(channel, data)
+        logger.debug("Published to %s, %s receivers", channel, count)
         return count
     
     async def subscribe_user_notifications(
         self, 
         user_id: str, 
         callback: Callable[[dict[str, Any]], Any]
-    ) -> PubSub:
+    ) -> None:
         """
         Subscribe to notifications for a specific user.
         
+        Registers the callback with the in-process dispatcher instead of
+        opening a PubSub connection per subscriber: one pattern subscription
+        on notification:user:* serves every local subscriber.
+        
         Args:
             user_id: User ID to subscribe to
             callback: Async function to call with each notification
-            
-        Returns:
-            PubSub object for managing subscription
         """
-        pubsub = self.client.pubsub()
-        channel = f"notification:user:{user_id}"
-        await pubsub.subscribe(channel)
-        logger.debug(f"Subscribed to {channel}")
-        
-        async def listener():
-            retry_count = 0
-            max_retries = 10
-            base_delay = 1  # seconds
-            
-            while retry_count < max_retries:
-                try:
-                    async for message in pubsub.listen():
-                        # Reset retry count on successful message
-                        retry_count = 0
-                        if message["type"] == "message":
-                            try:
-                                data = json.loads(message["data"])
-                                await callback(data)
-                            except json.JSONDecodeError:
-                                logger.error(f"Invalid JSON in notification: {message['data']}")
-                            except Exception as e:
-                                logger.error(f"Error in notification callback: {e}")
-                except asyncio.CancelledError:
-                    logger.debug(f"Listener cancelled for {channel}")
-                    break
-                except Exception as e:
-                    retry_count += 1
-                    delay = min(base_delay * (2 ** retry_count), 30)  # Max 30 seconds
-                    logger.warning(f"Notification listener error (attempt {retry_count}): {e}. Retrying in {delay}s...")
-                    await asyncio.sleep(delay)
-                    
-                    # Try to resubscribe
-                    try:
-                        await pubsub.subscribe(channel)
-                        logger.info(f"Resubscribed to {channel}")
-                    except Exception as resub_error:
-                        logger.error(f"Failed to resubscribe: {resub_error}")
-            
-            if retry_count >= max_retries:
-                logger.error(f"Max retries reached for {channel}, listener stopped")
-        
-        # Start listener in background
-        asyncio.create_task(listener())
-        
-        return pubsub
+        await self._ensure_notification_dispatcher()
+        subscribers = self._notification_subscribers.setdefault(user_id, {})
+        if callback in subscribers:
+            return
+        queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(
+            maxsize=USER_CALLBACK_QUEUE_SIZE
+        )
+        task = asyncio.create_task(self._drain_notifications(callback, queue))
+        subscribers[callback] = (queue, task)
+        logger.debug("Registered notification subscriber for user %s", user_id)
+    
+    async def unsubscribe_user_notifications(
+        self,
+        user_id: str,
+        callback: Callable[[dict[str, Any]], Any]
+    ) -> None:
+        """Remove a callback registered with subscribe_user_notifications."""
+        subscribers = self._notification_subscribers.get(user_id)
+        if subscribers is None:
+            return
+        entry = subscribers.pop(callback, None)
+        if entry is not None:
+            entry[1].cancel()
+        if not subscribers:
+            del self._notification_subscribers[user_id]
+    
+    async def _ensure_notification_dispatcher(self) -> None:
+        """Start the shared pattern subscription once."""
+        if self._listener_task and not self._listener_task.done():
+            return
+        async with self._dispatcher_lock:
+            if self._listener_task and not self._listener_task.done():
+                return
+            # Every process receives every user's notifications; only decode
+            # those with a subscriber connected to this process
+            await self.subscribe_all_notifications(
+                self._dispatch_notification,
+                user_filter=self._notification_subscribers.__contains__
+            )
+    
+    async def _dispatch_notification(self, user_id: str, data: dict[str, Any]) -> None:
+        """Hand a notification to every local subscriber of the user."""
+        subscribers = self._notification_subscribers.get(user_id)
+        if not subscribers:
+            return
+        # Queued for the subscriber's own drain task so a slow websocket send
+        # does not hold up the shared listener, and sends stay in order
+        for queue, _ in subscribers.values():
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                logger.warning(
+                    "Notification queue full for user %s, dropping notification",
+                    user_id
+                )
+    
+    @staticmethod
+    async def _drain_notifications(
+        callback: Callable[[dict[str, Any]], Any],
+        queue: asyncio.Queue[dict[str, Any]]
+    ) -> None:
+        """Deliver a subscriber's queued notifications one at a time."""
+        while True:
+            data = await queue.get()
+            try:
+                await callback(data)
+            except Exception as e:
+                logger.error(f"Error in notification callback: {e}")
     
     async def subscribe_all_notifications(
         self, 
-        callback: Callable[[str, dict[str, Any]], Any]
+        callback: Callable[[str, dict[str, Any]], Any],
+        user_filter: Optional[Callable[[str], bool]] = None
     ) -> PubSub:
         """
         Subscribe to all user notification channels using pattern subscribe.
-        Used by notification consumer service.
+        Used by the in-process notification dispatcher.
         
         Args:
             callback: Async function called with (user_id, payload) for each notification
+            user_filter: Optional check run on the user_id before the payload is
+                decoded; notifications it rejects are dropped unparsed
             
         Returns:
             PubSub object for managing subscription
         """
+        # Stop the previous listener before replacing its PubSub connection
+        if self._listener_task and not self._listener_task.done():
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+        
         if self._pubsub:
             await self._pubsub.close()
         
-        self._pubsub = self.client.pubsub()
+        self._pubsub = self.pubsub()
+        channel_prefix = b"notification:user:"
+        prefix_len = len(channel_prefix)
         pattern = "notification:user:*"
         await self._pubsub.psubscribe(pattern)
         logger.info(f"Subscribed to pattern {pattern}")
         
+        queue: asyncio.Queue[tuple[str, bytes]] = asyncio.Queue(
+            maxsize=NOTIFICATION_LISTENER_QUEUE_SIZE
+        )
+        
+        async def worker():
+            while True:
+                user_id, raw = await queue.get()
+                try:
+                    await callback(user_id, orjson.loads(raw))
+                except orjson.JSONDecodeError:
+                    logger.error(f"Invalid JSON in notification: {raw!r}")
+                except Exception as e:
+                    logger.error(f"Error in notification callback: {e}")
+        
         async def listener():
             retry_count = 0
             max_retries = 10
             base_delay = 1  # seconds
+            workers = [
+                asyncio.create_task(worker())
+                for _ in range(NOTIFICATION_LISTENER_WORKERS)
+            ]
             
-            while retry_count < max_retries:
-                try:
-                    async for message in self._pubsub.listen():
-                        # Reset retry count on successful message
-                        retry_count = 0
-                        if message["type"] == "pmessage":
-                            try:
-                                channel = message["channel"]
-                                # Extract user_id from channel: notification:user:{user_id}
-                                user_id = channel.split(":")[-1]
-                                data = json.loads(message["data"])
-                                await callback(user_id, data)
-                            except json.JSONDecodeError:
-                                logger.error(f"Invalid JSON in notification: {message['data']}")
-                            except Exception as e:
-                                logger.error(f"Error in notification callback: {e}")
-                except asyncio.CancelledError:
-                    logger.debug("Pattern listener cancelled")
-                    break
-                except Exception as e:
-                    retry_count += 1
-                    delay = min(base_delay * (2 ** retry_count), 30)  # Max 30 seconds
-                    logger.warning(f"Pattern listener error (attempt {retry_count}): {e}. Retrying in {delay}s...")
-                    await asyncio.sleep(delay)
-                    
-                    # Try to resubscribe
+            try:
+                while retry_count < max_retries:
                     try:
-                        await self._pubsub.psubscribe(pattern)
-                        logger.info(f"Resubscribed to pattern {pattern}")
-                    except Exception as resub_error:
-                        logger.error(f"Failed to resubscribe to pattern: {resub_error}")
-            
-            if retry_count >= max_retries:
-                logger.error(f"Max retries reached for pattern {pattern}, listener stopped")
+                        async for message in self._pubsub.listen():
+                            # Reset retry count on successful message
+                            retry_count = 0
+                            if message["type"] == "pmessage":
+                                # Extract user_id from channel: notification:user:{user_id}
+                                user_id = message["channel"][prefix_len:].decode()
+                                if user_filter is not None and not user_filter(user_id):
+                                    continue
+                                await queue.put((user_id, message["data"]))
+                    except asyncio.CancelledError:
+                        logger.debug("Pattern listener cancelled")
+                        break
+                    except Exception as e:
+                        retry_count += 1
+                        # First retry waits ~base_delay; jitter keeps listeners from reconnecting in lock-step
+                        delay = min(base_delay * (2 ** (retry_count - 1)), 30) + random.uniform(0, 1)
+                        logger.warning(f"Pattern listener error (attempt {retry_count}): {e}. Retrying in {delay:.1f}s...")
+                        await asyncio.sleep(delay)
+                        
+                        # Try to resubscribe
+                        try:
+                            await self._pubsub.psubscribe(pattern)
+                            logger.info(f"Resubscribed to pattern {pattern}")
+                        except Exception as resub_error:
+                            logger.error(f"Failed to resubscribe to pattern: {resub_error}")
+                
+                if retry_count >= max_retries:
+                    logger.error(f"Max retries reached for pattern {pattern}, listener stopped")
+            finally:
+                for task in workers:
+                    task.cancel()
         
         self._listener_task = asyncio.create_task(listener())
         
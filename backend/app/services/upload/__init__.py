@@ -29,8 +29,8 @@ from .factory import (
     ImageProvider,
     VideoProvider,
 )
-from .imgbb import ImgBBUploader
-from .s3 import S3VideoUploader
+from .imgbb import ImgBBUploader, close_imgbb_client
+from .s3 import S3VideoUploader, close_s3_clients
 
 
 __all__ = [
@@ -49,4 +49,7 @@ __all__ = [
     # Implementations
     "ImgBBUploader",
     "S3VideoUploader",
+    # Lifecycle
+    "close_imgbb_client",
+    "close_s3_clients",
 ]
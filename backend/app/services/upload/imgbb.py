@@ -1,16 +1,65 @@
 """ImgBB image upload implementation."""
 
-import base64
 import logging
 from typing import Optional
 
 import httpx
+from tenacity import (
+    AsyncRetrying,
+    RetryCallState,
+    before_sleep_log,
+    retry_if_exception_type,
+    retry_if_result,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 from app.core.config import settings
 from .base import ImageUploader, UploadResult
 
 logger = logging.getLogger(__name__)
 
+# Transient ImgBB responses worth retrying
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Longest wait between attempts, Retry-After included
+MAX_RETRY_WAIT_SECONDS = 30
+
+# 10s, 17s, then capped at 30s, plus up to 1s of random jitter
+_backoff = wait_exponential_jitter(initial=10, max=MAX_RETRY_WAIT_SECONDS, exp_base=1.7)
+
+
+# Shared client so uploads reuse pooled keep-alive connections to ImgBB
+_client = httpx.AsyncClient(
+    http2=True,
+    timeout=30.0,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+)
+
+
+async def close_imgbb_client() -> None:
+    """Close the shared ImgBB HTTP client. Call on application shutdown."""
+    await _client.aclose()
+
+
+def _is_retryable_response(response: httpx.Response) -> bool:
+    return response.status_code in RETRYABLE_STATUS_CODES
+
+
+def _wait_before_retry(retry_state: RetryCallState) -> float:
+    """Honor Retry-After on rate-limited responses, else exponential backoff."""
+    outcome = retry_state.outcome
+    if outcome is not None and not outcome.failed:
+        retry_after = outcome.result().headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), MAX_RETRY_WAIT_SECONDS)
+    return _backoff(retry_state)
+
+
+def _return_last_outcome(retry_state: RetryCallState) -> httpx.Response:
+    """After the last attempt, return its response or re-raise its error."""
+    return retry_state.outcome.result()
+
 
 class ImgBBUploader(ImageUploader):
     """ImgBB image upload service implementation."""
@@ -27,11 +76,31 @@ class ImgBBUploader(ImageUploader):
         self.api_key = api_key or settings.IMGBB_API_KEY
         if not self.api_key:
             raise ValueError("ImgBB API key is required")
+        # Static form fields, shared by every upload
+        self._form = {"key": self.api_key}
     
     @property
     def provider_name(self) -> str:
         return "imgbb"
     
+    async def _post_with_retry(
+        self,
+        data: dict[str, str],
+        files: dict[str, tuple[str, bytes, str]]
+    ) -> httpx.Response:
+        """POST to ImgBB, retrying timeouts, connection errors and 429/5xx."""
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(3),
+            wait=_wait_before_retry,
+            retry=(
+                retry_if_exception_type(httpx.TransportError)
+                | retry_if_result(_is_retryable_response)
+            ),
+            before_sleep=before_sleep_log(logger, logging.WARNING),
+            retry_error_callback=_return_last_outcome,
+        )
+        return await retrying(_client.post, self.API_URL, data=data, files=files)
+    
     async def upload(self, image_data: bytes, name: Optional[str] = None) -> UploadResult:
         """
         Upload image to ImgBB and return the display URL.
@@ -44,35 +113,30 @@ class ImgBBUploader(ImageUploader):
             UploadResult with success status and URL or error
         """
         try:
-            # Convert bytes to base64
-            image_base64 = base64.b64encode(image_data).decode("utf-8")
+            data = {**self._form, "name": name} if name else self._form
             
-            data = {
-                "key": self.api_key,
-                "image": image_base64,
+            # Send raw bytes as multipart file (avoids +33% base64 overhead)
+            files = {
+                "image": (name or "image", image_data, "application/octet-stream"),
             }
             
-            if name:
-                data["name"] = name
+            response = await self._post_with_retry(data, files)
+            result = response.json()
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(self.API_URL, data=data)
-                result = response.json()
-                
-                if not result.get("success"):
-                    logger.error(f"ImgBB upload failed: {result}")
-                    return UploadResult(
-                        success=False,
-                        error="Image upload failed",
-                        provider=self.provider_name
-                    )
-                
+            if not result.get("success"):
+                logger.error(f"ImgBB upload failed: {result}")
                 return UploadResult(
-                    success=True,
-                    url=result["data"]["display_url"],
+                    success=False,
+                    error="Image upload failed",
                     provider=self.provider_name
                 )
-                
+            
+            return UploadResult(
+                success=True,
+                url=result["data"]["display_url"],
+                provider=self.provider_name
+            )
+            
         except httpx.TimeoutException:
             logger.error("ImgBB upload timeout")
             return UploadResult(
@@ -1,8 +1,11 @@
 """AWS S3 video upload implementation."""
 
+import asyncio
+import contextlib
 import logging
+import re
 import uuid
-from typing import Optional
+from typing import Any, Optional
 
 import aioboto3
 
@@ -12,8 +15,70 @@ from .base import VideoUploader, UploadResult
 logger = logging.getLogger(__name__)
 
 
+# Videos larger than one part are sent as a multipart upload, with a few
+# parts in flight at once to use the available bandwidth
+S3_MULTIPART_PART_SIZE = 8 * 1024 * 1024
+S3_MULTIPART_CONCURRENCY = 4
+
+# Characters dropped from user-supplied names: anything but letters, digits and "._-"
+_UNSAFE_NAME_CHARS = re.compile(r"[^\w.-]")
+
+
+# Shared S3 clients, one per region and credentials, so uploads reuse pooled
+# connections instead of building a client and TLS session per upload
+_clients: dict[tuple[str, str, str], Any] = {}
+_client_stack = contextlib.AsyncExitStack()
+_clients_lock = asyncio.Lock()
+
+
+async def _get_s3_client(region: str, access_key: str, secret_key: str) -> Any:
+    """Get or create the shared S3 client for these credentials."""
+    key = (region, access_key, secret_key)
+    client = _clients.get(key)
+    if client is None:
+        async with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                session = aioboto3.Session(
+                    aws_access_key_id=access_key,
+                    aws_secret_access_key=secret_key,
+                    region_name=region
+                )
+                client = await _client_stack.enter_async_context(session.client('s3'))
+                _clients[key] = client
+    return client
+
+
+async def close_s3_clients() -> None:
+    """Close the shared S3 clients. Call on application shutdown."""
+    global _client_stack
+    _clients.clear()
+    stack, _client_stack = _client_stack, contextlib.AsyncExitStack()
+    await stack.aclose()
+
+
 class S3VideoUploader(VideoUploader):
-    """AWS S3 video upload service implementation."""
+    """
+    AWS S3 video upload service implementation.
+    
+    Objects are uploaded without per-object ACLs. Public read access comes
+    from a bucket policy instead, e.g.:
+    
+        {
+            "Effect": "Allow",
+            "Principal": "*",
+            "Action": "s3:GetObject",
+            "Resource": "arn:aws:s3:::<bucket>/videos/*"
+        }
+    """
+    
+    CONTENT_TYPE_EXTENSIONS = {
+        "video/mp4": ".mp4",
+        "video/webm": ".webm",
+        "video/quicktime": ".mov",
+        "video/x-msvideo": ".avi",
+        "video/x-matroska": ".mkv",
+    }
     
     def __init__(
         self,
@@ -47,20 +112,11 @@ class S3VideoUploader(VideoUploader):
     
     def _generate_key(self, name: Optional[str], content_type: Optional[str]) -> str:
         """Generate unique S3 key for the video."""
-        ext = ".mp4"  # Default extension
-        if content_type:
-            ext_map = {
-                "video/mp4": ".mp4",
-                "video/webm": ".webm",
-                "video/quicktime": ".mov",
-                "video/x-msvideo": ".avi",
-                "video/x-matroska": ".mkv",
-            }
-            ext = ext_map.get(content_type, ".mp4")
+        ext = self.CONTENT_TYPE_EXTENSIONS.get(content_type, ".mp4")
         
         if name:
             # Sanitize name
-            safe_name = "".join(c for c in name if c.isalnum() or c in "._-")
+            safe_name = _UNSAFE_NAME_CHARS.sub("", name)
             return f"videos/{uuid.uuid4().hex[:8]}_{safe_name}{ext}"
         
         return f"videos/{uuid.uuid4().hex}{ext}"
@@ -69,6 +125,68 @@ class S3VideoUploader(VideoUploader):
         """Generate public URL for the uploaded video."""
         return f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{key}"
     
+    async def _multipart_upload(
+        self,
+        s3: Any,
+        key: str,
+        video_data: bytes,
+        content_type: Optional[str]
+    ) -> None:
+        """Upload video_data in parts, aborting the upload if any part fails."""
+        created = await s3.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+            ContentType=content_type or "video/mp4"
+        )
+        upload_id = created["UploadId"]
+        
+        view = memoryview(video_data)
+        semaphore = asyncio.Semaphore(S3_MULTIPART_CONCURRENCY)
+        
+        async def upload_part(part_number: int, offset: int) -> dict[str, Any]:
+            async with semaphore:
+                # botocore needs bytes; copying one part at a time keeps the
+                # extra memory bounded by the number of parts in flight
+                body = bytes(view[offset:offset + S3_MULTIPART_PART_SIZE])
+                response = await s3.upload_part(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body
+                )
+                return {"PartNumber": part_number, "ETag": response["ETag"]}
+        
+        tasks = [
+            asyncio.create_task(upload_part(part_number, offset))
+            for part_number, offset in enumerate(
+                range(0, len(video_data), S3_MULTIPART_PART_SIZE), start=1
+            )
+        ]
+        try:
+            parts = await asyncio.gather(*tasks)
+            await s3.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": list(parts)}
+            )
+        except BaseException:
+            # Parts still uploading after the abort would be stored again
+            # under the aborted upload, so stop them first
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await s3.abort_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=key,
+                    UploadId=upload_id
+                )
+            except Exception as e:
+                logger.error(f"Failed to abort multipart upload {upload_id}: {e}")
+            raise
+    
     async def upload(
         self,
         video_data: bytes,
@@ -89,19 +207,15 @@ class S3VideoUploader(VideoUploader):
         try:
             key = self._generate_key(name, content_type)
             
-            session = aioboto3.Session(
-                aws_access_key_id=self.access_key,
-                aws_secret_access_key=self.secret_key,
-                region_name=self.region
-            )
-            
-            async with session.client('s3') as s3:
+            s3 = await _get_s3_client(self.region, self.access_key, self.secret_key)
+            if len(video_data) > S3_MULTIPART_PART_SIZE:
+                await self._multipart_upload(s3, key, video_data, content_type)
+            else:
                 await s3.put_object(
                     Bucket=self.bucket_name,
                     Key=key,
                     Body=video_data,
-                    ContentType=content_type or "video/mp4",
-                    ACL="public-read"  # Make video publicly accessible
+                    ContentType=content_type or "video/mp4"
                 )
             
             url = self._get_public_url(key)
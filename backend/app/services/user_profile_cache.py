@@ -0,0 +1,36 @@
+"""Read-through cache for the public profile fields shown next to events.
+
+Consumers render a username/avatar for every message and notification they
+fan out; the same few senders and actors repeat constantly, so the fields
+are cached in Redis (shared by every worker) and invalidated when the user
+changes their username or avatar.
+"""
+
+import logging
+from typing import Any, Optional
+
+from app.models import User, UserProfileProjection
+from app.services.redis_client import redis_service
+
+logger = logging.getLogger(__name__)
+
+
+async def get_user_profile(user_id: str) -> Optional[dict[str, Any]]:
+    """Get username/avatar for a user, reading through the Redis cache."""
+    try:
+        cached = await redis_service.get_user_profile(user_id)
+        if cached is not None:
+            return cached
+    except Exception as e:
+        logger.warning(f"Failed to read cached profile for {user_id}: {e}")
+
+    user = await User.find_one(User.id == user_id).project(UserProfileProjection)
+    if not user:
+        return None
+
+    profile = {"username": user.username, "avatar_url": user.avatar_url}
+    try:
+        await redis_service.set_user_profile(user_id, profile)
+    except Exception as e:
+        logger.warning(f"Failed to cache profile for {user_id}: {e}")
+    return profile
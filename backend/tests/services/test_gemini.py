@@ -0,0 +1,44 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.services.gemini import (
+    MIN_SCREENSHOT_LONG_SIDE,
+    _looks_like_screenshot,
+)
+
+
+def _png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    ("width", "height"),
+    [
+        (1920, 1080),  # Landscape phone screenshot
+        (1080, 2400),  # Portrait phone screenshot
+        (MIN_SCREENSHOT_LONG_SIDE, 480),
+    ],
+)
+def test_accepts_screenshot_sized_images(width: int, height: int) -> None:
+    assert _looks_like_screenshot(_png(width, height))
+
+
+@pytest.mark.parametrize(
+    ("width", "height"),
+    [
+        (MIN_SCREENSHOT_LONG_SIDE - 1, 400),  # Too small
+        (64, 64),
+        (3000, 900),  # Too wide (ratio 3.33)
+        (300, 1200),  # Too tall (ratio 0.25)
+    ],
+)
+def test_rejects_small_or_oddly_shaped_images(width: int, height: int) -> None:
+    assert not _looks_like_screenshot(_png(width, height))
+
+
+def test_rejects_non_image_bytes() -> None:
+    assert not _looks_like_screenshot(b"not an image")
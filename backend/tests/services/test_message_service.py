@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime, timezone
+
+from app.services.message_service import _encode_cursor, _keyset_filter
+
+
+def test_cursor_round_trip() -> None:
+    timestamp = datetime(2025, 3, 4, 5, 6, 7, 123000, tzinfo=timezone.utc)
+    doc_id = str(uuid.uuid4())
+
+    cursor = _encode_cursor(timestamp, doc_id)
+
+    assert ":" not in cursor
+    assert "=" not in cursor
+    assert _keyset_filter("created_at", cursor) == {
+        "$or": [
+            {"created_at": {"$lt": timestamp}},
+            {"created_at": timestamp, "_id": {"$lt": doc_id}},
+        ]
+    }
+
+
+def test_cursor_round_trip_naive_utc_timestamp() -> None:
+    # Mongo returns naive UTC datetimes
+    timestamp = datetime(2025, 3, 4, 5, 6, 7, 999000)
+    doc_id = str(uuid.uuid4())
+
+    query = _keyset_filter("updated_at", _encode_cursor(timestamp, doc_id))
+
+    cursor_dt = query["$or"][1]["updated_at"]
+    assert cursor_dt == timestamp.replace(tzinfo=timezone.utc)
+    assert query["$or"][1]["_id"] == {"$lt": doc_id}
+
+
+def test_legacy_iso_cursor() -> None:
+    query = _keyset_filter("created_at", "2025-03-04T05:06:07.123000Z")
+
+    assert query == {
+        "created_at": {
+            "$lt": datetime(2025, 3, 4, 5, 6, 7, 123000, tzinfo=timezone.utc)
+        }
+    }
+
+
+def test_legacy_iso_cursor_with_offset() -> None:
+    query = _keyset_filter("created_at", "2025-03-04T05:06:07+00:00")
+
+    assert query == {
+        "created_at": {"$lt": datetime(2025, 3, 4, 5, 6, 7, tzinfo=timezone.utc)}
+    }
@@ -0,0 +1,112 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from app.models import RANK_VALUES, RankEnum, UserSuggestionProjection
+from app.services.recommendation_service import score_candidates
+
+
+def _candidate(user_id: str, rank: RankEnum | None = None) -> UserSuggestionProjection:
+    return UserSuggestionProjection(
+        _id=user_id,
+        username=user_id,
+        rank=rank,
+        rank_value=RANK_VALUES.get(rank, 0),
+    )
+
+
+def _baseline_score(
+    user_rank: RankEnum | None,
+    candidate_rank: RankEnum | None,
+    mutual_friends: set[str],
+    friend_counts: dict[str, int],
+    user_post_ids: set[str],
+    candidate_post_ids: set[str],
+    post_like_counts: dict[str, int],
+) -> float:
+    """Per-candidate formula the vectorized scoring replaced."""
+    friend_score = 0.0
+    for fid in mutual_friends:
+        if friend_counts[fid] > 0:
+            friend_score += 1.0 / math.log(friend_counts[fid] + 1)
+    friend_score = min(friend_score * 4.5, 4.5)
+
+    content_score = 0.0
+    common_posts = user_post_ids & candidate_post_ids
+    if common_posts:
+        overlap = sum(
+            1.0 / math.log(post_like_counts[pid] + 1)
+            for pid in common_posts
+            if post_like_counts[pid] > 0
+        )
+        jaccard = len(common_posts) / len(user_post_ids | candidate_post_ids)
+        content_score = min((overlap + jaccard * 5) / 2 * 3.5, 3.5)
+
+    rank_score = 0.0
+    if user_rank is not None and candidate_rank is not None:
+        diff = abs(RANK_VALUES[user_rank] - RANK_VALUES[candidate_rank])
+        rank_score = math.exp(-(diff ** 2) / 2) * 2.0
+
+    return friend_score + content_score + rank_score
+
+
+def test_score_candidates_matches_baseline_formula() -> None:
+    user = SimpleNamespace(rank_value=RANK_VALUES[RankEnum.DIAMOND])
+    candidates = [
+        _candidate("a", RankEnum.DIAMOND),
+        _candidate("b", RankEnum.BRONZE),
+        _candidate("c", RankEnum.PLATINUM),
+        _candidate("d"),
+    ]
+    mutual_friends_by_user = {"a": {"f1", "f2"}, "b": {"f2"}, "d": {"f3"}}
+    friend_counts = {"f1": 3, "f2": 40, "f3": 1}
+    user_post_ids = {"p1", "p2", "p3"}
+    liked_post_ids = {"a": {"p1", "p9"}, "b": set(), "c": {"p2", "p3"}, "d": {"p8"}}
+    common_posts_by_user = {
+        cid: post_ids & user_post_ids for cid, post_ids in liked_post_ids.items()
+    }
+    post_like_counts = {"p1": 2, "p2": 7, "p3": 5000}
+
+    total_scores, mutual_counts = score_candidates(
+        user,
+        candidates,
+        mutual_friends_by_user,
+        friend_counts,
+        user_post_ids,
+        common_posts_by_user,
+        {cid: len(post_ids) for cid, post_ids in liked_post_ids.items()},
+        post_like_counts,
+    )
+
+    for i, candidate in enumerate(candidates):
+        expected = _baseline_score(
+            RankEnum.DIAMOND,
+            candidate.rank,
+            mutual_friends_by_user.get(candidate.id, set()),
+            friend_counts,
+            user_post_ids,
+            liked_post_ids[candidate.id],
+            post_like_counts,
+        )
+        assert total_scores[i] == pytest.approx(expected)
+        assert mutual_counts[i] == len(mutual_friends_by_user.get(candidate.id, ()))
+
+
+def test_score_candidates_unranked_candidate_against_top_rank() -> None:
+    user = SimpleNamespace(rank_value=RANK_VALUES[RankEnum.CONQUEROR])
+    candidates = [_candidate("unranked"), _candidate("bronze", RankEnum.BRONZE)]
+
+    total_scores, _ = score_candidates(user, candidates, {}, {}, set(), {}, {}, {})
+
+    assert total_scores[0] == 0.0
+    assert total_scores[1] == pytest.approx(math.exp(-(7 ** 2) / 2) * 2.0)
+
+
+def test_score_candidates_unranked_user() -> None:
+    user = SimpleNamespace(rank_value=0)
+    candidates = [_candidate("gold", RankEnum.GOLD)]
+
+    total_scores, _ = score_candidates(user, candidates, {}, {}, set(), {}, {}, {})
+
+    assert total_scores[0] == 0.0
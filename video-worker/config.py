@@ -26,6 +26,10 @@ class Config:
     S3_REGION = os.getenv("S3_REGION", "ap-southeast-1")
     S3_FORCE_PATH_STYLE = os.getenv("S3_FORCE_PATH_STYLE", "true").lower() == "true"
     S3_USE_SSL = os.getenv("S3_USE_SSL", "true").lower() == "true"
+    # AWS-only endpoint options for workers outside the bucket's region;
+    # ClawCloud supports neither, so both stay off by default
+    S3_ACCELERATE = os.getenv("S3_ACCELERATE", "false").lower() == "true"
+    S3_DUALSTACK = os.getenv("S3_DUALSTACK", "false").lower() == "true"
     
     # Use external endpoint for local dev, Docker can override with S3_INTERNAL_ENDPOINT
     S3_ENDPOINT = os.getenv("S3_ENDPOINT", "https://objectstorageapi.ap-southeast-1.clawcloudrun.com")
@@ -40,7 +44,29 @@ class Config:
     INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN", "internal-worker-token")
     
     # Processing settings
-    TEMP_DIR = "/tmp/video-worker"
+    # Work dir for the downloaded input and FFmpeg output; point it at a
+    # tmpfs (RAM disk) so each job's bytes never hit the container's disk
+    TEMP_DIR = os.getenv("TEMP_DIR", "/tmp/video-worker")
+    
+    # Max videos processed at once by one worker
+    WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "1"))
+    
+    # Encoder threads per FFmpeg run: 0 lets FFmpeg use every core, which
+    # oversubscribes the CPU when several jobs encode at once
+    FFMPEG_THREADS = 0 if WORKER_CONCURRENCY <= 1 else max(1, (os.cpu_count() or 1) // WORKER_CONCURRENCY)
+    
+    # FFmpeg runs are killed after this long: a floor plus a budget per
+    # second of input video; probes and thumbnails get a fixed limit
+    FFMPEG_TIMEOUT_MIN_SECONDS = int(os.getenv("FFMPEG_TIMEOUT_MIN_SECONDS", "600"))
+    FFMPEG_TIMEOUT_PER_VIDEO_SECOND = int(os.getenv("FFMPEG_TIMEOUT_PER_VIDEO_SECOND", "20"))
+    FFMPEG_SHORT_TIMEOUT_SECONDS = 120
+    
+    # Max processed files (segments, playlists) uploaded to S3 at once, per job
+    UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", "10"))
+    
+    # H.264 encoder: "auto" uses NVENC when a working GPU encoder is found,
+    # otherwise libx264; set "libx264" or "h264_nvenc" to force one
+    VIDEO_ENCODER = os.getenv("VIDEO_ENCODER", "auto")
     
     # FFmpeg output resolutions
     RESOLUTIONS = {
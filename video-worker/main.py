@@ -9,25 +9,29 @@ RabbitMQ consumer that:
 
 Best Practices Implemented:
 - Threaded video processing to maintain heartbeat
+- Acks posted back to the connection thread with add_callback_threadsafe
 - Connection recovery on failure
 - Graceful shutdown handling
 """
 
-import json
+import functools
 import logging
 import signal
 import sys
 import threading
 import time
-from concurrent.futures import ThreadPoolExecutor, Future
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
 from typing import Optional
 
+import orjson
 import pika
 import requests
 from pika.exceptions import AMQPConnectionError, StreamLostError, ChannelWrongStateError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from config import config
-from processor import VideoProcessor
+from processor import VideoProcessor, abort_all
 from s3_client import s3_client
 
 logging.basicConfig(
@@ -39,6 +43,22 @@ logger = logging.getLogger(__name__)
 # Graceful shutdown flag
 shutdown_event = threading.Event()
 
+# Shared session so backend callbacks reuse a keep-alive connection; the
+# processed callback only records the result, so retrying the POST is safe
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=4,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=None  # Retry on any method, including POST
+    )
+)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+
 
 def notify_backend(video_id: str, result: dict) -> bool:
     """Notify backend API that video processing is complete."""
@@ -59,7 +79,7 @@ def notify_backend(video_id: str, result: dict) -> bool:
         }
     
     try:
-        response = requests.post(
+        response = _session.post(
             endpoint,
             json=payload,
             headers={"X-Internal-Token": config.INTERNAL_API_TOKEN},
@@ -73,46 +93,96 @@ def notify_backend(video_id: str, result: dict) -> bool:
         return False
 
 
+class ProcessedFileUploader:
+    """
+    Upload processed files to S3 with bounded concurrency.
+    
+    HLS output is many small segments, so uploads are bound by request
+    latency rather than bandwidth; several run at once on a thread pool.
+    Files are submitted as the processor produces them, so uploading
+    overlaps with the remaining FFmpeg work.
+    """
+    
+    def __init__(self, video_id: str):
+        self.video_id = video_id
+        self._pool = ThreadPoolExecutor(max_workers=config.UPLOAD_MAX_CONCURRENCY)
+        self._futures: dict[Future, str] = {}
+        self._upload = s3_client.upload_processed_key
+        self._key_prefix = video_id + "/"
+    
+    def __enter__(self) -> "ProcessedFileUploader":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        # Wait for in-flight uploads before the work directory is removed
+        self._pool.shutdown(wait=True)
+    
+    def submit(self, relative_path: str, local_path: str) -> None:
+        """Start uploading one produced file."""
+        future = self._pool.submit(self._upload, local_path, self._key_prefix + relative_path)
+        self._futures[future] = relative_path
+    
+    def wait(self) -> list[str]:
+        """
+        Wait for every submitted upload.
+        
+        Returns:
+            Relative paths of the files that failed to upload
+        """
+        failed = []
+        for future in as_completed(self._futures):
+            relative_path = self._futures[future]
+            try:
+                url = future.result()
+            except Exception as e:
+                logger.warning(f"Failed to upload {relative_path}: {e}")
+                url = None
+            if not url:
+                failed.append(relative_path)
+        return sorted(failed)
+
+
 def process_video(video_id: str, raw_key: str) -> dict:
     """
     Process a single video.
     
     1. Download from S3
-    2. Transcode with FFmpeg
-    3. Upload results
-    4. Notify backend
+    2. Transcode with FFmpeg, uploading results as they are produced
+    3. Notify backend
     """
     logger.info(f"Processing video: {video_id} (key: {raw_key})")
     
     processor = VideoProcessor(video_id)
     
     try:
-        # Download raw video
+        # Download raw video straight into the work directory
         logger.info("Downloading raw video...")
-        video_data = s3_client.download_raw_video(raw_key)
+        processor.setup()
+        input_path = processor.get_input_path()
         
-        if not video_data:
+        if not s3_client.download_raw_video_to_file(raw_key, str(input_path)):
             return {"success": False, "error": "Failed to download raw video"}
         
-        # Process video
-        logger.info("Starting FFmpeg processing...")
-        result = processor.process(video_data)
-        
-        if not result["success"]:
-            return result
-        
-        # Upload processed files
-        logger.info("Uploading processed files...")
-        files = result.get("files", {})
-        
-        for relative_path, local_path in files.items():
-            url = s3_client.upload_processed_file(
-                str(local_path),
-                video_id,
-                relative_path
-            )
-            if not url:
-                logger.warning(f"Failed to upload: {relative_path}")
+        with ProcessedFileUploader(video_id) as uploader:
+            # Process video
+            logger.info("Starting FFmpeg processing...")
+            result = processor.process(input_path, on_file=uploader.submit)
+            
+            if not result["success"]:
+                return result
+            
+            # Finish uploading processed files
+            logger.info("Waiting for processed file uploads...")
+            files = result.get("files", {})
+            
+            failed = uploader.wait()
+            if failed:
+                logger.error(f"Failed to upload {len(failed)} files: {failed}")
+                return {
+                    "success": False,
+                    "error": f"Failed to upload {len(failed)} of {len(files)} files: {', '.join(failed[:5])}"
+                }
+            logger.info(f"Uploaded {len(files)} processed files for video {video_id}")
         
         logger.info(f"Video {video_id} processed and uploaded successfully")
         
@@ -134,14 +204,19 @@ class VideoWorker:
     - Thread pool for video processing to not block main thread
     - Connection recovery on failures
     - Graceful shutdown
+    
+    Channel operations (ack/nack) must run on the connection's thread:
+    worker threads dispatch them with connection.add_callback_threadsafe.
     """
     
     def __init__(self):
         self.connection: Optional[pika.BlockingConnection] = None
         self.channel = None
-        self.executor = ThreadPoolExecutor(max_workers=1)  # Process one at a time
-        self.current_task: Optional[Future] = None
-        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=config.WORKER_CONCURRENCY)
+        # Jobs in flight; each acks itself when done
+        self.current_tasks: set[Future] = set()
+        # The queue is durable, so it only needs declaring once per process
+        self._queue_declared = False
     
     def get_connection_parameters(self) -> pika.URLParameters:
         """
@@ -157,8 +232,23 @@ class VideoWorker:
         parameters.blocked_connection_timeout = 300
         # Socket timeout for operations
         parameters.socket_timeout = 60
+        # TCP keepalive detects dead peers at the socket level too
+        parameters.tcp_options = {"TCP_KEEPIDLE": 60, "TCP_KEEPINTVL": 30, "TCP_KEEPCNT": 3}
         return parameters
     
+    def _setup_channel(self) -> None:
+        """Declare the job queue (first connect only) and set QoS on the channel."""
+        if not self._queue_declared:
+            self.channel.queue_declare(
+                queue=config.VIDEO_TRANSCODE_QUEUE, 
+                durable=True
+            )
+            self._queue_declared = True
+        
+        # QoS belongs to the channel, so every new channel needs it.
+        # Only take as many messages as can be processed at once
+        self.channel.basic_qos(prefetch_count=config.WORKER_CONCURRENCY)
+    
     def connect(self) -> bool:
         """Establish connection to RabbitMQ with retry logic."""
         max_retries = 10
@@ -172,15 +262,7 @@ class VideoWorker:
                 parameters = self.get_connection_parameters()
                 self.connection = pika.BlockingConnection(parameters)
                 self.channel = self.connection.channel()
-                
-                # Declare queue
-                self.channel.queue_declare(
-                    queue=config.VIDEO_TRANSCODE_QUEUE, 
-                    durable=True
-                )
-                
-                # Process one message at a time
-                self.channel.basic_qos(prefetch_count=1)
+                self._setup_channel()
                 
                 logger.info(f"✅ Connected to RabbitMQ successfully")
                 return True
@@ -197,30 +279,71 @@ class VideoWorker:
         
         return False
     
-    def process_message_in_thread(self, video_id: str, raw_key: str) -> dict:
+    def process_message_in_thread(
+        self,
+        connection: pika.BlockingConnection,
+        channel,
+        delivery_tag: int,
+        video_id: str,
+        raw_key: str
+    ) -> dict:
         """
         Process video in a separate thread.
-        This allows the main thread to continue sending heartbeats.
+        
+        The main thread keeps running the connection (heartbeats); when the
+        job is done the ack is handed back to it, since pika channels must
+        only be used from the connection's own thread.
         """
         try:
             result = process_video(video_id, raw_key)
-            notify_backend(video_id, result)
-            return result
+            # An aborted job is left for another worker, not reported failed
+            if not result.get("aborted"):
+                notify_backend(video_id, result)
         except Exception as e:
             logger.exception(f"Error in processing thread: {e}")
-            return {"success": False, "error": str(e)}
+            result = {"success": False, "error": str(e)}
+        
+        try:
+            connection.add_callback_threadsafe(
+                functools.partial(self._finish_job, channel, delivery_tag, video_id, result)
+            )
+        except Exception as e:
+            # Connection was lost meanwhile; the broker redelivers the job
+            logger.warning(f"Could not schedule ack for video {video_id}: {e}")
+        return result
+    
+    def _finish_job(self, channel, delivery_tag: int, video_id: str, result: dict) -> None:
+        """Ack a finished job, or requeue an aborted one. Runs on the connection thread."""
+        if result.get("aborted"):
+            self._safe_nack(channel, delivery_tag, requeue=True)
+            logger.warning(f"⏹️ Video {video_id} aborted, requeued for another worker")
+            return
+        
+        self._safe_ack(channel, delivery_tag)
+        
+        if result["success"]:
+            logger.info(f"✅ Video {video_id} completed successfully")
+        else:
+            logger.error(f"❌ Video {video_id} failed: {result.get('error')}")
     
     def on_message(self, channel, method, properties, body):
         """
         Handle incoming RabbitMQ message.
         
-        Uses a thread pool to process video while keeping the main thread
-        free to handle heartbeats and connection management.
+        Submits the job to the thread pool and returns immediately, leaving
+        the main loop in run() free to handle heartbeats and connection
+        management; the worker thread schedules the ack when it is done.
         """
         delivery_tag = method.delivery_tag
         
+        # Deliveries that arrive while close() waits for running jobs go
+        # back to the queue for another worker
+        if shutdown_event.is_set():
+            self._safe_nack(channel, delivery_tag, requeue=True)
+            return
+        
         try:
-            message = json.loads(body.decode())
+            message = orjson.loads(body)
             video_id = message.get("video_id")
             raw_key = message.get("raw_key")
             
@@ -233,61 +356,39 @@ class VideoWorker:
             
             # Submit processing to thread pool
             future = self.executor.submit(
-                self.process_message_in_thread, 
-                video_id, 
+                self.process_message_in_thread,
+                self.connection,
+                channel,
+                delivery_tag,
+                video_id,
                 raw_key
             )
-            
-            # Wait for result while processing connection events (heartbeats)
-            while not future.done():
-                if shutdown_event.is_set():
-                    logger.info("Shutdown requested, waiting for current job...")
-                    break
-                
-                # Process connection events (heartbeats) while waiting
-                # This is the KEY to preventing connection timeout!
-                try:
-                    self.connection.process_data_events(time_limit=1.0)
-                except Exception as e:
-                    logger.warning(f"Error processing data events: {e}")
-                    break
-            
-            # Get the result
-            result = future.result(timeout=10)
-            
-            # Acknowledge message
-            self._safe_ack(channel, delivery_tag)
-            
-            if result["success"]:
-                logger.info(f"✅ Video {video_id} completed successfully")
-            else:
-                logger.error(f"❌ Video {video_id} failed: {result.get('error')}")
+            self.current_tasks.add(future)
+            future.add_done_callback(self.current_tasks.discard)
                 
         except Exception as e:
             logger.exception(f"Error processing message: {e}")
             self._safe_nack(channel, delivery_tag)
     
     def _safe_ack(self, channel, delivery_tag):
-        """Safely acknowledge a message, handling connection issues."""
+        """Safely acknowledge a message, handling connection issues. Connection thread only."""
         try:
-            with self._lock:
-                if channel.is_open:
-                    channel.basic_ack(delivery_tag=delivery_tag)
-                else:
-                    logger.warning("Channel closed, cannot ack message")
+            if channel.is_open:
+                channel.basic_ack(delivery_tag=delivery_tag)
+            else:
+                logger.warning("Channel closed, cannot ack message")
         except (StreamLostError, ChannelWrongStateError) as e:
             logger.warning(f"Could not ack message (connection issue): {e}")
         except Exception as e:
             logger.error(f"Unexpected error acking message: {e}")
     
-    def _safe_nack(self, channel, delivery_tag):
-        """Safely nack a message, handling connection issues."""
+    def _safe_nack(self, channel, delivery_tag, requeue: bool = False):
+        """Safely nack a message, handling connection issues. Connection thread only."""
         try:
-            with self._lock:
-                if channel.is_open:
-                    channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
-                else:
-                    logger.warning("Channel closed, cannot nack message")
+            if channel.is_open:
+                channel.basic_nack(delivery_tag=delivery_tag, requeue=requeue)
+            else:
+                logger.warning("Channel closed, cannot nack message")
         except (StreamLostError, ChannelWrongStateError) as e:
             logger.warning(f"Could not nack message (connection issue): {e}")
         except Exception as e:
@@ -297,12 +398,22 @@ class VideoWorker:
         """Clean shutdown of worker."""
         logger.info("Closing worker...")
         
+        # Keep servicing heartbeats and ack callbacks while in-flight jobs
+        # finish, so the broker does not drop the connection and requeue them
+        try:
+            while self.current_tasks and self.connection and self.connection.is_open:
+                self.connection.process_data_events(time_limit=1)
+        except Exception as e:
+            logger.warning(f"Error processing events during shutdown: {e}")
+        
         # Shutdown thread pool
         self.executor.shutdown(wait=True, cancel_futures=False)
         
         # Close RabbitMQ connection
         try:
             if self.connection and self.connection.is_open:
+                # Run the ack callback scheduled by the last job
+                self.connection.process_data_events(time_limit=0)
                 self.connection.close()
         except Exception as e:
             logger.warning(f"Error closing connection: {e}")
@@ -356,7 +467,17 @@ class VideoWorker:
 
 
 def signal_handler(signum, frame):
-    """Handle shutdown signals gracefully."""
+    """
+    Handle shutdown signals gracefully.
+    
+    The first signal lets running jobs finish; a second one kills their
+    FFmpeg processes so shutdown does not wait for long transcodes. Jobs
+    aborted that way are requeued rather than reported as failed.
+    """
+    if shutdown_event.is_set():
+        logger.info(f"Received signal {signum} again, killing running FFmpeg processes...")
+        abort_all()
+        return
     logger.info(f"Received signal {signum}, initiating graceful shutdown...")
     shutdown_event.set()
 
@@ -365,6 +486,7 @@ def main():
     """Main entry point - starts Video Worker."""
     logger.info("Starting Video Worker...")
     logger.info(f"RabbitMQ URL: {config.RABBITMQ_URL}")
+    logger.info(f"Concurrent jobs: {config.WORKER_CONCURRENCY}")
     logger.info(f"S3 Endpoint: {config.S3_ENDPOINT}")
     
     # Register signal handlers for graceful shutdown
@@ -8,10 +8,16 @@ Handles:
 
 import os
 import shutil
+import signal
 import subprocess
 import logging
+import uuid
+import weakref
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
+
+import orjson
 
 from config import config
 
@@ -19,40 +25,161 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def get_video_encoder() -> str:
+    """
+    Pick the H.264 encoder once per worker process.
+    
+    NVENC is only used if a short test encode succeeds: the encoder can be
+    compiled into FFmpeg on a machine without a usable GPU.
+    """
+    if config.VIDEO_ENCODER != "auto":
+        return config.VIDEO_ENCODER
+    
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'nullsrc=s=256x256:d=0.1',
+        '-c:v', 'h264_nvenc', '-f', 'null', '-'
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.info(f"NVENC check failed ({e}), using libx264")
+        return "libx264"
+    
+    if result.returncode != 0:
+        logger.info("NVENC not available, using libx264")
+        return "libx264"
+    
+    logger.info("Using NVENC hardware encoder")
+    return "h264_nvenc"
+
+
+# Processors with a job in progress, so a forced shutdown can kill their FFmpeg
+_active_processors: "weakref.WeakSet[VideoProcessor]" = weakref.WeakSet()
+
+
+def abort_all() -> None:
+    """Kill the FFmpeg process of every active processor."""
+    for processor in list(_active_processors):
+        processor.abort()
+
+
 class VideoProcessor:
     """Process videos using FFmpeg."""
     
     def __init__(self, video_id: str):
         """Initialize processor for a specific video."""
         self.video_id = video_id
-        self.work_dir = Path(config.TEMP_DIR) / video_id
+        # Unique per job, so a redelivered message processed while an
+        # earlier attempt is still running does not share its files
+        self.work_dir = Path(config.TEMP_DIR) / video_id / uuid.uuid4().hex
         self.input_path: Optional[Path] = None
+        self._info: Optional[dict] = None
         self.output_dir = self.work_dir / "output"
+        # Output files recorded as they are written: relative path -> local
+        # path, kept as str since that is what the uploader needs
+        self._produced_files: dict[str, str] = {}
+        self._on_file: Optional[Callable[[str, str], None]] = None
+        self._current_proc: Optional[subprocess.Popen] = None
+        # Set by abort(); no further FFmpeg runs are started once it is
+        self.aborted = False
         
     def setup(self) -> None:
         """Create working directories."""
         self.work_dir.mkdir(parents=True, exist_ok=True)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        _active_processors.add(self)
         logger.info(f"Created work directory: {self.work_dir}")
         
     def cleanup(self) -> None:
-        """Remove working directories."""
+        """Stop any running FFmpeg and remove working directories."""
+        self.abort()
+        _active_processors.discard(self)
         if self.work_dir.exists():
             shutil.rmtree(self.work_dir)
             logger.info(f"Cleaned up work directory: {self.work_dir}")
+        # Left in place while another job for the same video is using it
+        try:
+            self.work_dir.parent.rmdir()
+        except OSError:
+            pass
+    
+    def abort(self) -> None:
+        """Kill the running FFmpeg/ffprobe process, if any, and stop the job."""
+        self.aborted = True
+        proc = self._current_proc
+        if proc is not None and proc.poll() is None:
+            logger.warning(f"Killing {proc.args[0]} for video {self.video_id}")
+            self._kill(proc)
+    
+    @staticmethod
+    def _kill(proc: subprocess.Popen) -> None:
+        # Started in its own session, so its process group id is its pid and
+        # any helpers it spawned go down with it
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    
+    def _run(self, cmd: list[str], timeout: float, text: bool = True) -> subprocess.CompletedProcess:
+        """
+        Run an FFmpeg tool that cannot outlive this job.
+        
+        The process is killed if it exceeds timeout, if the calling thread
+        is interrupted, or if abort() is called meanwhile.
+        """
+        if self.aborted:
+            raise RuntimeError(f"Processing aborted for video {self.video_id}")
+        
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=text,
+            start_new_session=True
+        )
+        self._current_proc = proc
+        try:
+            stdout, stderr = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logger.error(f"{cmd[0]} timed out after {timeout:.0f}s")
+            self._kill(proc)
+            stdout, stderr = proc.communicate()
+        except BaseException:
+            self._kill(proc)
+            proc.wait()
+            raise
+        finally:
+            self._current_proc = None
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+    
+    def _transcode_timeout(self) -> float:
+        """Time limit for a transcode, scaled by the input duration."""
+        duration = self.get_duration() or 0
+        return max(
+            config.FFMPEG_TIMEOUT_MIN_SECONDS,
+            duration * config.FFMPEG_TIMEOUT_PER_VIDEO_SECOND
+        )
     
-    def save_input(self, video_data: bytes, filename: str = "input.mp4") -> Path:
-        """Save input video to work directory."""
-        self.input_path = self.work_dir / filename
-        with open(self.input_path, 'wb') as f:
-            f.write(video_data)
-        logger.info(f"Saved input video: {self.input_path} ({len(video_data)} bytes)")
+    def get_input_path(self, filename: str = "input.mp4") -> Path:
+        """Get the path the input video should be downloaded to."""
+        return self.work_dir / filename
+    
+    def save_input(self, input_path: Path) -> Path:
+        """Use an input video already written to disk."""
+        self.input_path = Path(input_path)
+        self._info = None
+        logger.info(f"Using input video: {self.input_path} ({self.input_path.stat().st_size} bytes)")
         return self.input_path
     
     def get_video_info(self) -> dict:
-        """Get video information using ffprobe."""
+        """Get video information using ffprobe, probing the input only once."""
         if not self.input_path:
             raise ValueError("Input video not set")
+        
+        if self._info is not None:
+            return self._info
             
         cmd = [
             'ffprobe', '-v', 'quiet',
@@ -61,14 +188,15 @@ class VideoProcessor:
             str(self.input_path)
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # Raw bytes: orjson parses them without a str decode first
+        result = self._run(cmd, config.FFMPEG_SHORT_TIMEOUT_SECONDS, text=False)
         
         if result.returncode != 0:
-            logger.error(f"ffprobe failed: {result.stderr}")
+            logger.error(f"ffprobe failed: {result.stderr.decode(errors='replace')}")
             return {}
-            
-        import json
-        return json.loads(result.stdout)
+        
+        self._info = orjson.loads(result.stdout)
+        return self._info
     
     def get_duration(self) -> Optional[float]:
         """Get video duration in seconds."""
@@ -107,6 +235,113 @@ class VideoProcessor:
             
         return sorted(output_resolutions, key=lambda x: int(x.replace('p', '')))
     
+    def _record_file(self, path: Path) -> None:
+        """Record an output file for upload and hand it to the on_file callback."""
+        relative = str(path.relative_to(self.output_dir))
+        local_path = str(path)
+        self._produced_files[relative] = local_path
+        if self._on_file:
+            self._on_file(relative, local_path)
+    
+    def _record_hls_output(self, resolution: str) -> None:
+        """Record a resolution's playlist and the segments it lists."""
+        res_dir = self.output_dir / resolution
+        playlist = res_dir / "playlist.m3u8"
+        self._record_file(playlist)
+        with open(playlist) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    self._record_file(res_dir / line)
+    
+    def _scale_filter(self, settings: dict) -> str:
+        """Scale and letterbox filter for an output resolution."""
+        return f"scale={settings['width']}:{settings['height']}:force_original_aspect_ratio=decrease,pad={settings['width']}:{settings['height']}:(ow-iw)/2:(oh-ih)/2"
+    
+    def _hls_output_args(self, settings: dict, res_dir: Path) -> list[str]:
+        """Encoder and HLS muxer arguments for one output resolution."""
+        # Only the encode runs on the GPU; decoding and the scale/pad
+        # filters stay on the CPU so both paths share one filter graph
+        if get_video_encoder() == "h264_nvenc":
+            encoder_args = ['-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr']
+        else:
+            encoder_args = ['-c:v', 'libx264', '-preset', 'fast']
+        
+        return encoder_args + [
+            # Video settings
+            '-threads', str(config.FFMPEG_THREADS),
+            '-b:v', settings['bitrate'],
+            '-maxrate', settings['bitrate'],
+            '-bufsize', f"{int(settings['bitrate'].replace('k', '')) * 2}k",
+            # Audio settings
+            '-c:a', 'aac',
+            '-b:a', '128k',
+            '-ar', '44100',
+            # HLS settings
+            '-f', 'hls',
+            '-hls_time', '6',
+            '-hls_list_size', '0',
+            '-hls_segment_filename', str(res_dir / 'segment_%03d.ts'),
+            str(res_dir / "playlist.m3u8")
+        ]
+    
+    def transcode_all_resolutions(self, resolutions: list[str]) -> bool:
+        """
+        Transcode every resolution in a single FFmpeg run.
+        
+        The input is decoded once and the frames are split into one scaled
+        HLS output per resolution, instead of decoding it again per output.
+        The thumbnail is taken from the same decode as one more output.
+        """
+        if not self.input_path:
+            raise ValueError("Input video not set")
+        
+        thumbnail_path = self.output_dir / "thumbnail.jpg"
+        branches = len(resolutions) + 1
+        filters = [
+            f"[0:v]split={branches}" + "".join(f"[v{i}]" for i in range(branches)),
+            f"[v{len(resolutions)}]scale=640:-1[thumb]",
+        ]
+        outputs = []
+        for i, resolution in enumerate(resolutions):
+            settings = config.RESOLUTIONS[resolution]
+            res_dir = self.output_dir / resolution
+            res_dir.mkdir(parents=True, exist_ok=True)
+            
+            filters.append(f"[v{i}]{self._scale_filter(settings)}[out{i}]")
+            outputs += ['-map', f'[out{i}]', '-map', '0:a:0?']
+            outputs += self._hls_output_args(settings, res_dir)
+        
+        outputs += [
+            '-map', '[thumb]',
+            '-ss', '1',
+            '-frames:v', '1',
+            '-q:v', '2',
+            str(thumbnail_path)
+        ]
+        
+        cmd = [
+            'ffmpeg', '-y',
+            '-i', str(self.input_path),
+            '-filter_complex', ';'.join(filters),
+        ] + outputs
+        
+        logger.info(f"Transcoding to {resolutions} in one pass...")
+        result = self._run(cmd, self._transcode_timeout())
+        
+        if result.returncode != 0:
+            logger.error(f"Multi-output transcode failed: {result.stderr}")
+            return False
+        
+        for resolution in resolutions:
+            self._record_hls_output(resolution)
+        # Videos shorter than the thumbnail timestamp produce no frame
+        if thumbnail_path.exists():
+            self._record_file(thumbnail_path)
+        
+        logger.info(f"Transcoded to {resolutions} successfully")
+        return True
+    
     def transcode_resolution(self, resolution: str) -> Optional[Path]:
         """Transcode video to a specific resolution with HLS output."""
         if not self.input_path:
@@ -126,31 +361,17 @@ class VideoProcessor:
         cmd = [
             'ffmpeg', '-y',
             '-i', str(self.input_path),
-            # Video settings
-            '-vf', f"scale={settings['width']}:{settings['height']}:force_original_aspect_ratio=decrease,pad={settings['width']}:{settings['height']}:(ow-iw)/2:(oh-ih)/2",
-            '-c:v', 'libx264',
-            '-preset', 'fast',
-            '-b:v', settings['bitrate'],
-            '-maxrate', settings['bitrate'],
-            '-bufsize', f"{int(settings['bitrate'].replace('k', '')) * 2}k",
-            # Audio settings
-            '-c:a', 'aac',
-            '-b:a', '128k',
-            '-ar', '44100',
-            # HLS settings
-            '-f', 'hls',
-            '-hls_time', '6',
-            '-hls_list_size', '0',
-            '-hls_segment_filename', str(res_dir / 'segment_%03d.ts'),
-            str(output_playlist)
-        ]
+            '-vf', self._scale_filter(settings),
+        ] + self._hls_output_args(settings, res_dir)
         
         logger.info(f"Transcoding to {resolution}...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run(cmd, self._transcode_timeout())
         
         if result.returncode != 0:
             logger.error(f"Transcode failed for {resolution}: {result.stderr}")
             return None
+        
+        self._record_hls_output(resolution)
             
         logger.info(f"Transcoded to {resolution} successfully")
         return output_playlist
@@ -170,6 +391,7 @@ class VideoProcessor:
                 f.write(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={settings.get('width', 854)}x{settings.get('height', 480)}\n")
                 f.write(f"{resolution}/playlist.m3u8\n")
         
+        self._record_file(master_path)
         logger.info(f"Generated master playlist: {master_path}")
         return master_path
     
@@ -190,28 +412,40 @@ class VideoProcessor:
             str(thumbnail_path)
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = self._run(cmd, config.FFMPEG_SHORT_TIMEOUT_SECONDS)
         
         if result.returncode != 0:
             logger.error(f"Thumbnail generation failed: {result.stderr}")
             return None
+        
+        self._record_file(thumbnail_path)
             
         logger.info(f"Generated thumbnail: {thumbnail_path}")
         return thumbnail_path
     
-    def process(self, video_data: bytes) -> dict:
+    def process(
+        self,
+        input_path: Path,
+        on_file: Optional[Callable[[str, str], None]] = None
+    ) -> dict:
         """
-        Full processing pipeline.
+        Full processing pipeline for an input video on disk.
+        
+        on_file, if given, is called with (relative path, local path) as
+        soon as each output file is complete, before processing finishes.
         
         Returns dict with:
         - success: bool
         - duration: float (seconds)
         - resolutions: list[str]
         - files: dict mapping relative paths to local paths
+        - aborted: True if abort() stopped processing; the job was not
+          processed and should be retried rather than reported as failed
         """
         try:
+            self._on_file = on_file
             self.setup()
-            self.save_input(video_data)
+            self.save_input(input_path)
             
             # Get video info
             duration = self.get_duration()
@@ -220,12 +454,19 @@ class VideoProcessor:
             resolutions = self.determine_output_resolutions()
             logger.info(f"Will generate resolutions: {resolutions}")
             
-            # Transcode each resolution
-            successful_resolutions = []
-            for resolution in resolutions:
-                result = self.transcode_resolution(resolution)
-                if result:
-                    successful_resolutions.append(resolution)
+            # Transcode all resolutions in one pass, falling back to one
+            # FFmpeg run per resolution so a single bad output is skipped
+            if self.transcode_all_resolutions(resolutions):
+                successful_resolutions = resolutions
+            elif self.aborted:
+                return self._aborted_result()
+            else:
+                successful_resolutions = []
+                for resolution in resolutions:
+                    shutil.rmtree(self.output_dir / resolution, ignore_errors=True)
+                    result = self.transcode_resolution(resolution)
+                    if result:
+                        successful_resolutions.append(resolution)
             
             if not successful_resolutions:
                 return {"success": False, "error": "All transcodes failed"}
@@ -233,23 +474,26 @@ class VideoProcessor:
             # Generate master playlist
             self.generate_master_playlist(successful_resolutions)
             
-            # Generate thumbnail
-            self.generate_thumbnail()
+            # Generate thumbnail unless the single-pass transcode produced it
+            if "thumbnail.jpg" not in self._produced_files:
+                self.generate_thumbnail()
             
-            # Collect all output files
-            files = {}
-            for path in self.output_dir.rglob('*'):
-                if path.is_file():
-                    relative = path.relative_to(self.output_dir)
-                    files[str(relative)] = path
+            if self.aborted:
+                return self._aborted_result()
             
             return {
                 "success": True,
                 "duration": duration,
                 "resolutions": successful_resolutions,
-                "files": files
+                "files": dict(self._produced_files)
             }
             
         except Exception as e:
+            if self.aborted:
+                return self._aborted_result()
             logger.exception(f"Processing failed: {e}")
             return {"success": False, "error": str(e)}
+    
+    def _aborted_result(self) -> dict:
+        logger.warning(f"Processing aborted for video {self.video_id}")
+        return {"success": False, "aborted": True, "error": "Processing aborted"}
@@ -1,10 +1,12 @@
 """Helper module for S3 operations in video worker."""
 
+import gzip
 import logging
-import mimetypes
+import os
 from typing import Optional
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config as BotoConfig
 
 from config import config
@@ -12,15 +14,50 @@ from config import config
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Files above 8MB are sent as multipart uploads with several parts in flight;
+# smaller ones (most HLS segments) stay a single PUT
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_THRESHOLD,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True
+)
+
+# Read buffer for files streamed as a single PUT body
+UPLOAD_READ_BUFFER_SIZE = 1024 * 1024
+
 
 class S3Client:
     """S3 client for video worker."""
     
+    # Content types of the files the processor produces
+    CONTENT_TYPES = {
+        '.m3u8': 'application/vnd.apple.mpegurl',
+        '.ts': 'video/MP2T',
+        '.jpg': 'image/jpeg',
+        '.jpeg': 'image/jpeg',
+        '.png': 'image/png',
+    }
+    
     def __init__(self):
         """Initialize S3 client with ClawCloud configuration."""
         boto_config = BotoConfig(
             signature_version='s3v4',
-            s3={'addressing_style': 'path'}
+            s3={
+                # Transfer acceleration only works with virtual-hosted URLs
+                'addressing_style': 'virtual' if config.S3_ACCELERATE else 'path',
+                'use_accelerate_endpoint': config.S3_ACCELERATE,
+                'use_dualstack_endpoint': config.S3_DUALSTACK
+            },
+            # One pooled connection per concurrent upload thread, with room
+            # for the transfer manager's part threads on large files
+            max_pool_connections=max(32, config.UPLOAD_MAX_CONCURRENCY * config.WORKER_CONCURRENCY),
+            # Keep idle pooled connections alive so uploads skip new handshakes
+            tcp_keepalive=True,
+            retries={'max_attempts': 10, 'mode': 'adaptive'},
+            connect_timeout=5,
+            read_timeout=60
         )
         
         self.client = boto3.client(
@@ -35,20 +72,25 @@ class S3Client:
         self.raw_bucket = config.S3_RAW_BUCKET
         self.processed_bucket = config.S3_PROCESSED_BUCKET
         self.cdn_base_url = config.CDN_BASE_URL
+        # Shared prefix of every public URL for processed files
+        self._url_prefix = f"{self.cdn_base_url}/{self.processed_bucket}/"
     
-    def download_raw_video(self, s3_key: str) -> Optional[bytes]:
-        """Download raw video from S3."""
+    def download_raw_video_to_file(self, s3_key: str, dest_path: str) -> bool:
+        """Download raw video from S3 straight to a local file."""
         try:
-            response = self.client.get_object(
-                Bucket=self.raw_bucket,
-                Key=s3_key
+            # Ranged parts are written to disk as they arrive, so memory use
+            # does not grow with the video size
+            self.client.download_file(
+                self.raw_bucket,
+                s3_key,
+                dest_path,
+                Config=TRANSFER_CONFIG
             )
-            data = response['Body'].read()
-            logger.info(f"Downloaded raw video: {s3_key} ({len(data)} bytes)")
-            return data
+            logger.info(f"Downloaded raw video: {s3_key} -> {dest_path}")
+            return True
         except Exception as e:
             logger.error(f"Failed to download {s3_key}: {e}")
-            return None
+            return False
     
     def upload_processed_file(
         self, 
@@ -57,28 +99,52 @@ class S3Client:
         relative_path: str
     ) -> Optional[str]:
         """Upload processed file to S3."""
-        s3_key = f"{video_id}/{relative_path}"
-        
-        # Determine content type
-        content_type, _ = mimetypes.guess_type(local_path)
-        if content_type is None:
-            if local_path.endswith('.m3u8'):
-                content_type = 'application/vnd.apple.mpegurl'
-            elif local_path.endswith('.ts'):
-                content_type = 'video/MP2T'
-            else:
-                content_type = 'application/octet-stream'
+        return self.upload_processed_key(local_path, f"{video_id}/{relative_path}")
+    
+    def upload_processed_key(self, local_path: str, s3_key: str) -> Optional[str]:
+        """Upload processed file to S3 under a fully-formed key."""
+        content_type = self.CONTENT_TYPES.get(
+            os.path.splitext(local_path)[1].lower(),
+            'application/octet-stream'
+        )
         
         try:
-            with open(local_path, 'rb') as f:
+            if content_type == 'application/vnd.apple.mpegurl':
+                # Playlists are small, highly compressible text: store them
+                # gzipped and let clients decode via Content-Encoding
+                with open(local_path, 'rb') as f:
+                    body = gzip.compress(f.read(), compresslevel=6)
                 self.client.put_object(
                     Bucket=self.processed_bucket,
                     Key=s3_key,
-                    Body=f.read(),
-                    ContentType=content_type
+                    Body=body,
+                    ContentType=content_type,
+                    ContentEncoding='gzip'
                 )
+            # Other files stream from disk instead of being read into memory
+            elif os.path.getsize(local_path) > MULTIPART_THRESHOLD:
+                self.client.upload_file(
+                    local_path,
+                    self.processed_bucket,
+                    s3_key,
+                    ExtraArgs={'ContentType': content_type},
+                    Config=TRANSFER_CONFIG
+                )
+            else:
+                # Small files skip the transfer manager, which sets up its
+                # own futures and threads for every call. A large read
+                # buffer serves http.client's 8 KiB body reads from memory
+                # instead of one read syscall each
+                with open(local_path, 'rb', buffering=UPLOAD_READ_BUFFER_SIZE) as f:
+                    self.client.put_object(
+                        Bucket=self.processed_bucket,
+                        Key=s3_key,
+                        Body=f,
+                        ContentType=content_type
+                    )
             
-            logger.info(f"Uploaded: {s3_key}")
+            # Per-file success is debug-only; jobs log one upload summary
+            logger.debug("Uploaded: %s", s3_key)
             return self.get_public_url(s3_key)
         except Exception as e:
             logger.error(f"Failed to upload {s3_key}: {e}")
@@ -86,15 +152,15 @@ class S3Client:
     
     def get_public_url(self, s3_key: str) -> str:
         """Get public URL for processed file."""
-        return f"{self.cdn_base_url}/{self.processed_bucket}/{s3_key}"
+        return self._url_prefix + s3_key
     
     def get_play_url(self, video_id: str) -> str:
         """Get HLS master playlist URL."""
-        return f"{self.cdn_base_url}/{self.processed_bucket}/{video_id}/master.m3u8"
+        return f"{self._url_prefix}{video_id}/master.m3u8"
     
     def get_thumbnail_url(self, video_id: str) -> str:
         """Get thumbnail URL."""
-        return f"{self.cdn_base_url}/{self.processed_bucket}/{video_id}/thumbnail.jpg"
+        return f"{self._url_prefix}{video_id}/thumbnail.jpg"
 
 
 # Singleton instance